@@ -1,40 +1,90 @@
+import argparse
+import hashlib
+import json
 import os
 import re
 import sys
-
-from typing import Optional
-
-
-def preprocess_c_code(text: str) -> str:
-    no_comments = remove_comments(text)
-    no_includes = remove_includes(no_comments)
-    merged_lines = merge_lines(no_includes)
-
-    return re.sub(r" +", " ", merged_lines)
-
-
-def remove_includes(text: str) -> str:
-    return "\n".join(line for line in text.split("\n") if "#include" not in line)
-
-
-def merge_lines(text: str) -> str:
-    buffer = []
-
-    res = []
-    for line in text.split("\n"):
+import tempfile
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+"""
+Konwersja testow C (asercje na funkcjach gamma_*) do testow py.
+Plik jest czytany linia po linii: komentarze blokowe i liniowe,
+#include oraz laczenie linii az do ';' sa robione w jednym przejsciu.
+
+W trybie katalogowym pliki sa konwertowane rownolegle, a w katalogu
+wyjsciowym trzymany jest manifest (MANIFEST_NAME) z hashami zrodel -
+pliki, ktorych zrodlo, konwerter i szablon sie nie zmienily, sa pomijane.
+
+Usage: python convert_to_py.py <input_directory_path> <output_directory_path>
+       [--jobs N] [--force]
+"""
+
+SPACES = re.compile(r" +")
+LINE_COMMENT = re.compile(r"//.*")
+ASSERTION = re.compile(r"(?<=assert\().*(?=\) *;)")
+COMPARISON = re.compile(r"[!=]=")
+POINTER_OR_ARRAY = re.compile(r"\*|(\[\])")
+GAMMA_DELETION = re.compile(r"gamma_delete\(.*\)")
+
+TEMPLATE_PATH = "templates/py_file_template"
+MANIFEST_NAME = ".convert_to_py.json"
+STRCMP = "def strcmp(str1: str, str2: str) -> int: return (str1 > str2) - (str1 < str2)"
+
+# szablon wczytany raz na proces roboczy
+worker_template: Optional[str] = None
+
+
+def strip_block_comments(lines: Iterable[str]) -> Iterator[str]:
+    """yields lines (without \\n) as if /* ... */ comments were removed from
+    the whole text; text before and after a multiline comment is one line"""
+    logical = ""
+    # surowy tekst od niezamknietego /*, zostaje jezeli komentarz sie nie skonczy
+    pending = ""
+    in_comment = False
+
+    for line in lines:
+        position = 0
+        if in_comment:
+            end = line.find("*/")
+            if end == -1:
+                pending += line
+                continue
+            in_comment, pending, position = False, "", end + 2
+
+        while True:
+            start = line.find("/*", position)
+            if start == -1:
+                logical += line[position:]
+                break
+            logical += line[position:start]
+            end = line.find("*/", start + 2)
+            if end == -1:
+                in_comment, pending = True, line[start:]
+                break
+            position = end + 2
+
+        if not in_comment and logical.endswith("\n"):
+            yield logical[:-1]
+            logical = ""
+
+    yield from (logical + pending).split("\n")
+
+
+def preprocess_c_code(lines: Iterable[str]) -> Iterator[str]:
+    """C statements, each in one line with collapsed spaces"""
+    buffer: List[str] = []
+    for line in strip_block_comments(lines):
+        line = LINE_COMMENT.sub("", line)
+        if "#include" in line:
+            continue
         buffer.append(line)
         if ";" in line:
-            res.append(" ".join(buffer))
+            yield SPACES.sub(" ", " ".join(buffer))
             buffer = []
 
-    return "\n".join(res)
-
-
-def remove_comments(text: str) -> str:
-    text_without_block_comments = re.sub(r"/\*(.|\n|\r)*?\*/", "", text)
-    text_without_line_comments = re.sub(r"//.*", "", text_without_block_comments)
-    return text_without_line_comments
-
 
 def check_exclamation_mark(text: str) -> str:
     return text.replace("!", "not ")
@@ -49,19 +99,17 @@ def check_null(text: str) -> str:
 def process_assertion(line: str) -> str:
     l_side = ""
     operand = ""
-    match = re.findall(r"(?<=assert\().*(?=\) *;)", line)
+    match = ASSERTION.search(line)
     if match is None:
         return ""
-    if not len(match):
-        return ""
-    text = match[0]
+    text = match.group()
 
     if "==" in text:
         operand = "is" if "NULL" in text else "=="
     elif "!=" in text:
         operand = "is not" if "NULL" in text else "!="
 
-    split = list(map(check_null, map(check_exclamation_mark, re.split(r"[!=]=", text))))
+    split = list(map(check_null, map(check_exclamation_mark, COMPARISON.split(text))))
     if len(split) == 2:
         l_side = check_null(split[0])
         r_side = check_null(split[1])
@@ -81,7 +129,7 @@ def get_name(text: str) -> str:
         else:
             name = split[-1]
 
-    return re.sub(r"\*|(\[\])", "", name)
+    return POINTER_OR_ARRAY.sub("", name)
 
 
 def process_assignment(line: str) -> str:
@@ -95,7 +143,7 @@ def process_assignment(line: str) -> str:
 
 
 def process_gamma_deletion(line: str) -> str:
-    match = re.search(r"gamma_delete\(.*\)", line)
+    match = GAMMA_DELETION.search(line)
     if match is None:
         return ""
     return match.group()
@@ -111,16 +159,32 @@ def process_line(line: str) -> str:
     return ""
 
 
+def py_lines(lines: Iterable[str]) -> Iterator[str]:
+    for statement in preprocess_c_code(lines):
+        processed = process_line(statement)
+        if processed:
+            yield SPACES.sub(" ", processed)
+
+
 def gen_py(file_name: str) -> str:
-    res = []
     with open(file_name, "r") as f:
-        code = preprocess_c_code(f.read())
-    for line in code.split("\n"):
-        processed = process_line(line)
-        if processed:
-            res += [processed]
+        return "\n".join(py_lines(f))
+
 
-    return "\n".join(res)
+def load_template() -> str:
+    with open(TEMPLATE_PATH, "r") as t:
+        return t.read()
+
+
+def write_py(c_file: TextIO, py_file: TextIO, template: str) -> None:
+    head, tail = template.format("\0").split("\0")
+    py_file.write(head)
+    py_file.write(STRCMP + "\n\n")
+    separator = ""
+    for line in py_lines(c_file):
+        py_file.write(separator + line)
+        separator = "\n"
+    py_file.write(tail)
 
 
 def convert_file(
@@ -129,58 +193,142 @@ def convert_file(
     if file_name[-2:] != ".c":
         return False
 
-    with open("templates/py_file_template", "r") as t:
-        template = t.read()
-
-    py_code = gen_py(file_name)
-    strcmp = (
-        "def strcmp(str1: str, str2: str) -> int: return (str1 > str2) - (str1 < str2)"
-    )
-
-    final = re.sub(r" +", " ", "\n".join([strcmp, "", py_code]))
-
     if out_file_name is None:
         out_file_name = os.path.basename(file_name)[:-1] + "py"
 
     out_name = "/".join([out_dir_name, out_file_name])
+    out_dir = os.path.dirname(out_name)
+    os.makedirs(out_dir, exist_ok=True)
 
-    if not os.path.exists(os.path.dirname(out_name)):
-        os.makedirs(os.path.dirname(out_name))
-
-    with open(out_name, "w") as f:
-        f.write(template.format(final))
+    template = worker_template or load_template()
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, prefix=".tmp")
+    try:
+        with open(file_name, "r") as c_file, os.fdopen(fd, "w") as py_file:
+            write_py(c_file, py_file, template)
+        os.replace(tmp_path, out_name)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
     return True
 
 
-def convert(in_dir: str, out_dir: str) -> None:
-    if os.path.isdir(in_dir):
-        for name in os.listdir(in_dir):
-            print(name, out_dir)
-            full_name = "/".join([in_dir, name])
-            if os.path.isfile(full_name):
-                if name.endswith(".c"):
-                    convert_file(full_name, out_dir)
-            elif os.path.isdir(full_name):
-                convert(full_name, "/".join([out_dir, name]))
-    else:
+def converter_hash() -> str:
+    """zmiana konwertera albo szablonu uniewaznia caly manifest"""
+    digest = hashlib.sha256()
+    for path in [os.path.abspath(__file__), TEMPLATE_PATH]:
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def source_hash(file_name: str, salt: str) -> str:
+    digest = hashlib.sha256(salt.encode())
+    with open(file_name, "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def find_c_files(in_dir: str) -> Iterator[Tuple[str, str]]:
+    """(path to the .c file, its directory relative to in_dir)"""
+    for root, dirs, files in os.walk(in_dir):
+        dirs.sort()
+        relative_dir = os.path.relpath(root, in_dir)
+        for name in sorted(files):
+            if name.endswith(".c"):
+                yield os.path.join(root, name), relative_dir
+
+
+def init_worker() -> None:
+    global worker_template
+    worker_template = load_template()
+
+
+def convert_job(job: Tuple[str, str, str]) -> str:
+    file_name, out_dir_name, out_file_name = job
+    convert_file(file_name, out_dir_name, out_file_name)
+    return out_file_name
+
+
+def read_manifest(path: str) -> Dict[str, str]:
+    try:
+        with open(path, "r") as f:
+            return dict(json.load(f))
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(path: str, manifest: Dict[str, str]) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=0, sort_keys=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def convert(
+    in_dir: str, out_dir: str, jobs: Optional[int] = None, force: bool = False
+) -> Tuple[int, int]:
+    """returns (converted, unchanged) file counts"""
+    if not os.path.isdir(in_dir):
         raise NotAFolderException()
 
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    old_manifest = {} if force else read_manifest(manifest_path)
+    manifest: Dict[str, str] = {}  # hashes of all current sources
+    salt = converter_hash()
+
+    convert_jobs = []
+    # wpisy plikow, ktorych wynik jest aktualny
+    done: Dict[str, str] = {}
+    for file_name, relative_dir in find_c_files(in_dir):
+        out_file_name = os.path.normpath(
+            os.path.join(relative_dir, os.path.basename(file_name)[:-1] + "py")
+        )
+        manifest[out_file_name] = source_hash(file_name, salt)
+        if old_manifest.get(out_file_name) == manifest[out_file_name] and (
+            os.path.exists(os.path.join(out_dir, out_file_name))
+        ):
+            done[out_file_name] = manifest[out_file_name]
+            continue
+        convert_jobs.append((file_name, out_dir, out_file_name))
+
+    try:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as executor:
+            for out_file_name in executor.map(convert_job, convert_jobs, chunksize=16):
+                done[out_file_name] = manifest[out_file_name]
+    finally:
+        write_manifest(manifest_path, done)
+
+    return len(convert_jobs), len(manifest) - len(convert_jobs)
+
 
 class NotAFolderException(Exception):
     pass
 
 
-if __name__ == "__main__":
-    print(sys.argv)
-    if len(sys.argv) < 3:
-        print(
-            "usage: python convert_to_py.py <input_directory_path> "
-            "<output_directory_path>\n "
-        )
-        sys.exit(1)
+def main() -> None:
+    parser = argparse.ArgumentParser(description="convert C gamma tests to python")
+    parser.add_argument("input_directory_path")
+    parser.add_argument("output_directory_path")
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="ignore the manifest")
+    args = parser.parse_args()
 
     try:
-        convert(*sys.argv[1:])
+        converted, unchanged = convert(
+            args.input_directory_path, args.output_directory_path, args.jobs, args.force
+        )
     except NotAFolderException:
         print("It's not a folder")
+        sys.exit(1)
+
+    print(f"{converted} converted, {unchanged} unchanged", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
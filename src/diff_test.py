@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import part2
+
+"""
+Testowanie roznicowe batch mode: skompilowana gamma studenta kontra
+wzorcowe part2 uruchamiane w tym samym procesie.
+Testy (pliki .in, katalogi sa przeszukiwane rekurencyjnie) rozdzielane
+sa pomiedzy procesy robocze; w kazdym z nich binarka dziala rownolegle
+z wyliczaniem oczekiwanego wyniku. Wyjscie binarki jest porownywane
+linia po linii w trakcie czytania i binarka jest zabijana przy pierwszej
+roznicy, wiec nie trzeba trzymac calego jej wyjscia w pamieci.
+
+Raport to jedna linia JSON na test, np.
+{"test": "a.in", "status": "mismatch", "stream": "stdout", "line": 12,
+ "expected": "1", "actual": "0", "returncode": 0, "time": 0.01}
+status: ok | mismatch | timeout | crash (niezerowy kod wyjscia)
+| oracle_error (wyjatek w part2, opis w "error").
+Kod wyjscia skryptu jest rowny 1 jezeli ktorykolwiek test nie przeszedl.
+
+Usage: python diff_test.py sciezka/do/gamma testy/ [inne.in ...]
+       [--jobs N] [--timeout SEKUNDY] [--report raport.jsonl] [--failures-only]
+"""
+
+MAX_REPORTED_LINE = 200
+
+
+def find_tests(paths: Iterable[str], suffix: str = ".in") -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(suffix):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def first_mismatch(expected: str, actual: IO[bytes]) -> Optional[Dict[str, Any]]:
+    """reads the stream line by line until the first difference; from
+    every line only as many bytes as the expected line has are read"""
+    for line, e in enumerate(expected.splitlines(keepends=True), start=1):
+        expected_line = e.encode()
+        a = actual.readline(len(expected_line))
+        if a != expected_line:
+            return {
+                "line": line,
+                "expected": e[:MAX_REPORTED_LINE],
+                "actual": a.decode(errors="replace")[:MAX_REPORTED_LINE] or None,
+            }
+
+    a = actual.readline(MAX_REPORTED_LINE)
+    if a:
+        return {
+            "line": len(expected.splitlines()) + 1,
+            "expected": None,
+            "actual": a.decode(errors="replace"),
+        }
+    return None
+
+
+def kill(process: subprocess.Popen) -> None:
+    """zabija cala grupe procesow - binarka moze byc np. skryptem"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def write_input(process: subprocess.Popen, statements: bytes) -> None:
+    assert process.stdin is not None
+    try:
+        process.stdin.write(statements)
+        process.stdin.close()
+    except (BrokenPipeError, OSError):
+        pass  # binarka skonczyla albo zostala zabita przed przeczytaniem wejscia
+
+
+def check_test(binary: str, path: str, timeout: float) -> Dict[str, Any]:
+    with open(path, newline="") as f:
+        statements = f.read()
+
+    report = judge(
+        binary, statements, timeout, lambda: part2.expected_output(statements)
+    )
+    return {"test": path, **report}
+
+
+def judge(
+    binary: str,
+    statements: str,
+    timeout: float,
+    expected_output: Callable[[], Tuple[str, str]],
+) -> Dict[str, Any]:
+    report: Dict[str, Any] = {}
+    start = time.monotonic()
+    process = subprocess.Popen(
+        [binary],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    # pierwsza roznica (strumien, opis); pozniejsze moga wynikac z zabicia
+    mismatches: List[Tuple[str, Dict[str, Any]]] = []
+    lock = threading.Lock()
+    timed_out = threading.Event()
+
+    def compare(stream: str, expected: str, actual: IO[bytes]) -> None:
+        mismatch = first_mismatch(expected, actual)
+        if mismatch is not None:
+            with lock:
+                if not timed_out.is_set():
+                    mismatches.append((stream, mismatch))
+            kill(process)
+
+    def on_timeout() -> None:
+        with lock:
+            timed_out.set()
+        kill(process)
+
+    assert process.stdout is not None and process.stderr is not None
+    timer = threading.Timer(timeout, on_timeout)
+    with ThreadPoolExecutor(max_workers=2) as workers:
+        try:
+            # binarka dostaje wejscie i liczy w tle, a w tym czasie
+            # w tym procesie liczy sie wzorcowy wynik
+            workers.submit(write_input, process, statements.encode())
+            try:
+                expected_out, expected_err = expected_output()
+            except Exception as e:
+                report.update(status="oracle_error", error=f"{type(e).__name__}: {e}")
+                return report
+
+            # limit czasu liczy sie od konca wyliczania wzorcowego wyniku,
+            # do tego czasu binarka mogla stac na pelnym pipe
+            timer.start()
+            stderr_check = workers.submit(
+                compare, "stderr", expected_err, process.stderr
+            )
+            compare("stdout", expected_out, process.stdout)
+            stderr_check.result()
+            process.wait()
+        finally:
+            timer.cancel()
+            if process.returncode is None:
+                kill(process)
+                process.wait()
+            process.stdout.close()
+            process.stderr.close()
+            report["time"] = time.monotonic() - start
+
+    report = {"returncode": process.returncode, **report}
+    if mismatches:
+        stream, mismatch = mismatches[0]
+        report.update(status="mismatch", stream=stream, **mismatch)
+    elif timed_out.is_set():
+        report = {"status": "timeout", "time": report["time"]}
+    else:
+        report["status"] = "ok" if process.returncode == 0 else "crash"
+    return report
+
+
+def run(
+    binary: str, tests: List[str], jobs: Optional[int], timeout: float
+) -> Iterator[Dict[str, Any]]:
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(
+            check_test,
+            itertools.repeat(binary),
+            tests,
+            itertools.repeat(timeout),
+            chunksize=4,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="compare a gamma binary against the reference implementation"
+    )
+    parser.add_argument("binary")
+    parser.add_argument("tests", nargs="+", help=".in files or directories")
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--report", help="write the report here instead of stdout")
+    parser.add_argument("--failures-only", action="store_true")
+    args = parser.parse_args()
+
+    binary = os.path.abspath(args.binary)
+    if not os.access(binary, os.X_OK):
+        exit(f"{args.binary} nie jest plikiem wykonywalnym")
+
+    tests = list(find_tests(args.tests))
+    counts: Dict[str, int] = {}
+    report_file = open(args.report, "w") if args.report else sys.stdout
+    try:
+        for result in run(binary, tests, args.jobs, args.timeout):
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            if result["status"] != "ok" or not args.failures_only:
+                print(json.dumps(result), file=report_file, flush=True)
+    finally:
+        if report_file is not sys.stdout:
+            report_file.close()
+
+    summary = ", ".join(f"{k}: {v}" for k, v in sorted(counts.items()))
+    print(f"{len(tests)} tests; {summary}", file=sys.stderr)
+    sys.exit(int(counts.get("ok", 0) != len(tests)))
+
+
+if __name__ == "__main__":
+    main()
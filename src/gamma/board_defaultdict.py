@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from collections import defaultdict
-from typing import Callable, Mapping, MutableMapping, cast
+from typing import Any, Callable, Mapping, MutableMapping, Tuple, cast
 
 
 class BoardDefaultRowCol(defaultdict):
@@ -13,6 +13,11 @@ class BoardDefaultRowCol(defaultdict):
         self.min_key = lower
         self.max_key = upper
 
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # defaultdict pomija atrybuty instancji, bez nich kopia jest bezuzyteczna
+        cls, args, _, list_items, dict_items = super().__reduce__()
+        return cls, args, self.__dict__.copy(), list_items, dict_items
+
     def __missing__(self, key: int) -> int:
         if key > self.max_key or key < self.min_key or self.default_factory is None:
             raise KeyError()
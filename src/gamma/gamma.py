@@ -2,109 +2,363 @@ from __future__ import annotations
 
 import itertools
 
-from typing import Iterator, List, Set, Tuple
+from array import array
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
 
 from gamma.board import Board
-from gamma.group_areas import Coords, make_neighbor_getter
+from gamma.group_areas import Coords
 
 flatten = itertools.chain.from_iterable
 
+FREE_FIELD = Board.FREE_FIELD
+
+
+class PlayerStats(NamedTuple):
+    """answers of the queries for every player, indexed by player
+    (index 0 is unused)"""
+
+    busy: array[int]
+    free: array[int]
+    areas: array[int]
+    golden: List[bool]
+
 
 class Gamma:
+    """Fields are kept in flat lists indexed by row * width + column;
+    areas are tracked incrementally with a union-find over the fields,
+    so moves and queries do not regroup the whole board.
+    `board` mirrors the fields as rows for printing and grouping."""
+
     board: Board
+    # incremented on every change of the board, lets callers cache query results
+    epoch: int
 
     def __init__(self, width: int, height: int, players: int, areas: int) -> None:
         self.board = Board(width, height)
         self.players = players
-        self.max_areas = areas
+        self.epoch = 0
         self._golden_move_done: Set[int] = set()
 
-    def _is_in_valid_state(self) -> bool:
-        areas_by_player = self.board.get_grouped_areas()
-        if Board.FREE_FIELD in areas_by_player:
-            del areas_by_player[Board.FREE_FIELD]
+        self._size = width * height
+        self._owner: List[int] = [FREE_FIELD] * self._size
+        self._parent: List[int] = list(range(self._size))
+        self._busy: Dict[int, int] = {}
+        self._areas: Dict[int, int] = {}
+        # number of free fields adjacent to at least one field of the player
+        self._free_neighbors: Dict[int, int] = {}
+        self._free_fields = self._size
+        self._over_limit: Set[int] = set()
+        self._splits: Optional[Tuple[int, List[int]]] = None
+        # (epoch, max_areas), player -> can_move(player)
+        self._movable: Tuple[Tuple[int, int], Dict[int, bool]] = ((-1, 0), {})
+        # (epoch, max_areas), golden_possible_all()
+        self._golden: Tuple[Tuple[int, int], List[bool]] = ((-1, 0), [])
+
+        self.max_areas = areas
+
+    @property
+    def max_areas(self) -> int:
+        return self._max_areas
+
+    @max_areas.setter
+    def max_areas(self, areas: int) -> None:
+        self._max_areas = areas
+        self._over_limit = {p for p, a in self._areas.items() if a > areas}
 
-        return all(
-            len(player_areas) <= self.max_areas
-            for player_areas in areas_by_player.values()
+    def _index(self, column: int, row: int) -> int:
+        if not (0 <= column < self.board.width and 0 <= row < self.board.height):
+            raise KeyError((column, row))
+        return row * self.board.width + column
+
+    def _neighbors(self, index: int) -> List[int]:
+        width = self.board.width
+        neighbors = []
+        column = index % width
+        if column > 0:
+            neighbors.append(index - 1)
+        if column < width - 1:
+            neighbors.append(index + 1)
+        if index >= width:
+            neighbors.append(index - width)
+        if index + width < self._size:
+            neighbors.append(index + width)
+        return neighbors
+
+    def _find(self, index: int) -> int:
+        parent = self._parent
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    def _player_roots(self, index: int, player: int) -> Set[int]:
+        """areas of the player touching the field"""
+        owner = self._owner
+        return {self._find(n) for n in self._neighbors(index) if owner[n] == player}
+
+    def _split(self, index: int) -> List[List[int]]:
+        """areas that the area containing the field falls apart into
+        when the field is taken away from its owner"""
+        owner = self._owner
+        player = owner[index]
+        visited = {index}
+        components = []
+        for start in self._neighbors(index):
+            if owner[start] != player or start in visited:
+                continue
+            visited.add(start)
+            component = [start]
+            for field in component:  # list grows while iterating - bfs
+                for n in self._neighbors(field):
+                    if owner[n] == player and n not in visited:
+                        visited.add(n)
+                        component.append(n)
+            components.append(component)
+        return components
+
+    def _set_areas(self, player: int, areas: int) -> None:
+        self._areas[player] = areas
+        if areas > self._max_areas:
+            self._over_limit.add(player)
+        else:
+            self._over_limit.discard(player)
+
+    def _is_valid_after(self, areas: Dict[int, int]) -> bool:
+        """would the state be valid if the players had these numbers of areas"""
+        return self._over_limit <= areas.keys() and all(
+            a <= self._max_areas for a in areas.values()
         )
 
+    def _update_mirror(self, index: int, player: int) -> None:
+        row, column = divmod(index, self.board.width)
+        self.board.board[row][column] = player
+
+    def _place(self, player: int, index: int) -> None:
+        """puts the player on a free field, without any checks"""
+        owner = self._owner
+        neighbors = self._neighbors(index)
+
+        for neighbor_owner in {owner[n] for n in neighbors}:
+            if neighbor_owner != FREE_FIELD:
+                self._free_neighbors[neighbor_owner] -= 1
+        for n in neighbors:
+            if owner[n] == FREE_FIELD and player not in map(
+                owner.__getitem__, self._neighbors(n)
+            ):
+                self._free_neighbors[player] = self._free_neighbors.get(player, 0) + 1
+
+        roots = self._player_roots(index, player)
+        owner[index] = player
+        self._parent[index] = index
+        for root in roots:
+            self._parent[root] = index
+
+        self._set_areas(player, self._areas.get(player, 0) + 1 - len(roots))
+        self._busy[player] = self._busy.get(player, 0) + 1
+        self._free_fields -= 1
+        self._update_mirror(index, player)
+
+    def _replace(self, player: int, index: int, components: List[List[int]]) -> None:
+        """takes the field from its owner and gives it to the player;
+        components is what _split returned for this field"""
+        owner = self._owner
+        previous = owner[index]
+
+        for n in self._neighbors(index):
+            if owner[n] != FREE_FIELD:
+                continue
+            others = [owner[m] for m in self._neighbors(n) if m != index]
+            if previous not in others:
+                self._free_neighbors[previous] -= 1
+            if player not in others:
+                self._free_neighbors[player] = self._free_neighbors.get(player, 0) + 1
+
+        for component in components:
+            root = component[0]
+            for field in component:
+                self._parent[field] = root
+        self._set_areas(previous, self._areas[previous] - 1 + len(components))
+        self._busy[previous] -= 1
+
+        roots = self._player_roots(index, player)
+        owner[index] = player
+        self._parent[index] = index
+        for root in roots:
+            self._parent[root] = index
+
+        self._set_areas(player, self._areas.get(player, 0) + 1 - len(roots))
+        self._busy[player] = self._busy.get(player, 0) + 1
+        self._update_mirror(index, player)
+
     def try_move(self, player: int, column: int, row: int) -> bool:
         if player == 0:
             return False
-        if self.board.board[row][column] != Board.FREE_FIELD:
+        index = self._index(column, row)
+        if self._owner[index] != FREE_FIELD:
             return False
 
-        self.board.board[row][column] = player
-        if self._is_in_valid_state():
-            return True
+        areas = self._areas.get(player, 0) + 1 - len(self._player_roots(index, player))
+        if not self._is_valid_after({player: areas}):
+            return False
 
-        del self.board.board[row][column]
-        return False
+        self._place(player, index)
+        self.epoch += 1
+        return True
 
     def unsafe_move(self, player: int, column: int, row: int) -> bool:
-        self.board.board[row][column] = player
+        index = self._index(column, row)
+        previous = self._owner[index]
+        if previous == FREE_FIELD:
+            self._place(player, index)
+        elif previous != player:
+            self._replace(player, index, self._split(index))
+        self.epoch += 1
         return True
 
     def try_golden_move(
         self, player: int, column: int, row: int, check_golden_done: bool = True
     ) -> bool:
+        """with check_golden_done=False only checks if the move is possible"""
         if player == 0:
             return False
         if check_golden_done and player in self._golden_move_done:
             return False
 
-        field = self.board.board[row][column]
-        if field == Board.FREE_FIELD or field == player:
+        index = self._index(column, row)
+        previous = self._owner[index]
+        if previous == FREE_FIELD or previous == player:
             return False
 
-        del self.board.board[row][column]
-        moved = self.try_move(player, column, row)
-        if moved and check_golden_done:
-            self._golden_move_done.add(player)
-        else:
-            self.board.board[row][column] = field
+        player_areas = (
+            self._areas.get(player, 0) + 1 - len(self._player_roots(index, player))
+        )
+        if not self._is_valid_after({player: player_areas, previous: 0}):
+            return False
 
-        return moved
+        owner = self._owner
+        previous_neighbors = sum(owner[n] == previous for n in self._neighbors(index))
+        components: Optional[List[List[int]]] = None
+        if self._areas[previous] - 1 + previous_neighbors > self._max_areas:
+            components = self._split(index)
+            if self._areas[previous] - 1 + len(components) > self._max_areas:
+                return False
+
+        if not check_golden_done:
+            return True
+
+        self._replace(player, index, components or self._split(index))
+        self._golden_move_done.add(player)
+        self.epoch += 1
+        return True
 
     def get_free_fields(self, player: int) -> int:
-        return len(list(self.get_free_fields_coords(player)))
+        if player == 0 or player > self.players:
+            return 0
+        if self._areas.get(player, 0) < self._max_areas:
+            return self._free_fields
+        return self._free_neighbors.get(player, 0)
 
     # kolejnosć y x
     def get_free_fields_coords(self, player: int) -> Iterator[Tuple[int, int]]:
         if player == 0 or player > self.players:
             return iter([])
-        grouped_areas = self.board.get_grouped_areas()
-        free_coords = flatten(grouped_areas.get(Board.FREE_FIELD, []))
-        player_areas = grouped_areas.get(player, [])
-        if len(player_areas) < self.max_areas:
-            return free_coords
-
-        neighbor_getter = make_neighbor_getter(self.board.height, self.board.width)
-        return (
-            coord
-            for coord in free_coords
-            if self._can_move_to_empty_field(
-                player_areas, list(neighbor_getter(*coord))
-            )
-        )
-
-    @staticmethod
-    def _can_move_to_empty_field(
-        player_areas: List[Set[Coords]], neighbors: List[Coords]
-    ) -> bool:
-        for n in neighbors:
-            if any(n in area for area in player_areas):
-                return True
 
-        return False
+        owner = self._owner
+        free = (i for i in range(self._size) if owner[i] == FREE_FIELD)
+        if self._areas.get(player, 0) >= self._max_areas:
+            free = (
+                i
+                for i in free
+                if player in map(owner.__getitem__, self._neighbors(i))
+            )
+        return iter([divmod(i, self.board.width) for i in free])
 
     def get_busy_fields(self, player: int) -> int:
         if player == 0 or player > self.players:
             return 0
-        return sum(
-            list(row.values()).count(player) for row in self.board.board.values()
-        )
+        return self._busy.get(player, 0)
+
+    def _removal_splits(self) -> List[int]:
+        """for every occupied field: into how many areas its area falls
+        apart when the field is taken away (articulation points of the
+        areas, iterative Tarjan); cached until the next change"""
+        if self._splits is not None and self._splits[0] == self.epoch:
+            return self._splits[1]
+
+        owner = self._owner
+        discovery = [0] * self._size
+        low = [0] * self._size
+        splits = [0] * self._size
+        time = 1
+
+        def same_owner(field: int) -> Iterator[int]:
+            return (n for n in self._neighbors(field) if owner[n] == owner[field])
+
+        for start in range(self._size):
+            if owner[start] == FREE_FIELD or discovery[start]:
+                continue
+
+            discovery[start] = low[start] = time
+            time += 1
+            stack = [(start, -1, same_owner(start))]
+            while stack:
+                field, parent, neighbors = stack[-1]
+                for n in neighbors:
+                    if n == parent:
+                        continue
+                    if discovery[n]:
+                        low[field] = min(low[field], discovery[n])
+                    else:
+                        discovery[n] = low[n] = time
+                        time += 1
+                        splits[n] = 1  # the part containing the parent
+                        stack.append((n, field, same_owner(n)))
+                        break
+                else:
+                    stack.pop()
+                    if parent != -1:
+                        low[parent] = min(low[parent], low[field])
+                        if low[field] >= discovery[parent]:
+                            splits[parent] += 1
+
+        self._splits = (self.epoch, splits)
+        return splits
+
+    def _can_take_away(self, field: int) -> bool:
+        """would the owner of the field stay within max_areas without it"""
+        owner = self._owner
+        previous = owner[field]
+        allowed_split = self._max_areas - self._areas[previous] + 1
+        if sum(owner[n] == previous for n in self._neighbors(field)) <= allowed_split:
+            return True
+        return self._removal_splits()[field] <= allowed_split
+
+    def _golden_move_targets(self, player: int) -> Iterator[int]:
+        """fields of other players which the player could take with
+        a golden move, assuming the player already has max_areas areas"""
+        owner = self._owner
+        others_over_limit = self._over_limit - {player}
+        if len(others_over_limit) > 1:
+            return
+
+        player_areas = self._areas.get(player, 0)
+        needed_roots = player_areas + 1 - self._max_areas
+        seen = set()
+
+        for field in range(self._size):
+            if owner[field] != player:
+                continue
+            for target in self._neighbors(field):
+                previous = owner[target]
+                if previous == FREE_FIELD or previous == player or target in seen:
+                    continue
+                seen.add(target)
+                if others_over_limit and previous not in others_over_limit:
+                    continue
+                if len(self._player_roots(target, player)) < needed_roots:
+                    continue
+                if self._can_take_away(target):
+                    yield target
 
     def is_golden_possible(self, player: int) -> bool:
         if player == 0 or player > self.players:
@@ -112,20 +366,100 @@ class Gamma:
         if player in self._golden_move_done:
             return False
 
-        grouped_areas = self.board.get_grouped_areas()
-        if not set(grouped_areas.keys()) - {player, Board.FREE_FIELD}:
+        if not any(busy for p, busy in self._busy.items() if p != player):
             return False
 
-        if len(grouped_areas.get(player, [])) < self.max_areas:
+        if self._areas.get(player, 0) < self._max_areas:
             return True
 
-        for y, column in self.board.board.items():
-            for x, prev_player in list(column.items()):
-                if prev_player == player or prev_player == Board.FREE_FIELD:
+        return next(self._golden_move_targets(player), None) is not None
+
+    def golden_possible_all(self) -> List[bool]:
+        """is_golden_possible for every player (index 0 is unused) from one
+        pass over the fields - whether a field can be taken away from its
+        owner is checked once for all the players next to it;
+        cached until the next change of the board"""
+        state = (self.epoch, self._max_areas)
+        if self._golden[0] == state:
+            return self._golden[1]
+
+        owner = self._owner
+        occupied = self._size - self._free_fields
+        possible = [False] * (self.players + 1)
+        # players with max_areas areas, they need a field to take
+        searching: Set[int] = set()
+        for player in range(1, self.players + 1):
+            if player in self._golden_move_done:
+                continue
+            if occupied == self._busy.get(player, 0):
+                continue  # no fields of other players
+            if self._areas.get(player, 0) < self._max_areas:
+                possible[player] = True
+            elif len(self._over_limit - {player}) <= 1:
+                searching.add(player)
+
+        for target in range(self._size):
+            if not searching:
+                break
+            previous = owner[target]
+            if previous == FREE_FIELD:
+                continue
+            neighbors = {owner[n] for n in self._neighbors(target)}
+            candidates = (neighbors & searching) - {previous}
+            can_take_away: Optional[bool] = None
+
+            for player in candidates:
+                others_over_limit = self._over_limit - {player}
+                if others_over_limit and previous not in others_over_limit:
+                    continue
+                needed_roots = self._areas[player] + 1 - self._max_areas
+                if len(self._player_roots(target, player)) < needed_roots:
                     continue
-                assert prev_player == self.board.board[y][x]
-                if self.try_golden_move(player, x, y, False):
-                    self.board.board[y][x] = prev_player
-                    return True
+                if can_take_away is None:
+                    can_take_away = self._can_take_away(target)
+                if not can_take_away:
+                    break
+                possible[player] = True
+                searching.discard(player)
+
+        self._golden = (state, possible)
+        return possible
+
+    def stats(self, golden: bool = True) -> PlayerStats:
+        """get_busy_fields, get_free_fields, number of areas and
+        is_golden_possible of all the players at once; with golden=False
+        the golden list is empty, it is the only part needing a pass
+        over the fields"""
+        players = range(self.players + 1)
+        busy = array("q", (self._busy.get(p, 0) for p in players))
+        areas = array("q", (self._areas.get(p, 0) for p in players))
+        free = array(
+            "q",
+            (
+                self._free_fields
+                if areas[p] < self._max_areas
+                else self._free_neighbors.get(p, 0)
+                for p in players
+            ),
+        )
+        free[0] = 0  # like get_free_fields(0)
+        return PlayerStats(
+            busy, free, areas, self.golden_possible_all() if golden else []
+        )
+
+    def can_move(self, player: int) -> bool:
+        """gamma_free_fields != 0 or gamma_golden_possible;
+        cached until the next change of the board"""
+        state = (self.epoch, self._max_areas)
+        if self._movable[0] != state:
+            self._movable = (state, {})
+        movable = self._movable[1]
+        if player not in movable:
+            # golden_possible_all scans the board, only when needed
+            movable[player] = bool(self.get_free_fields(player)) or (
+                0 < player <= self.players and self.golden_possible_all()[player]
+            )
+        return movable[player]
 
-        return False
+    def movable_players(self) -> List[int]:
+        return [p for p in range(1, self.players + 1) if self.can_move(p)]
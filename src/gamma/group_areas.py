@@ -120,5 +120,3 @@ def main() -> None:
 
 if __name__ == "__main__":
     main()
-
-main()
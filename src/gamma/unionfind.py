@@ -5,10 +5,10 @@
 """
 A union-find disjoint set data structure.
 
-"""
+numpy is imported lazily, only by the methods that still use it,
+so that importing the module (and the engine) does not pull it in.
 
-# Third-party libraries
-import numpy as np
+"""
 
 
 class UnionFind:
@@ -163,7 +163,9 @@ class UnionFind:
         if x not in self._indx:
             raise ValueError("{} is not an element".format(x))
 
-        p = self._indx[x]
+        return self._find_index(self._indx[x])
+
+    def _find_index(self, p):
         while p != self._par[p]:
             # path compression
             q = self._par[p]
@@ -236,6 +238,8 @@ class UnionFind:
         """
         if x not in self:
             raise ValueError("{} is not an element".format(x))
+        import numpy as np
+
         elts = np.array(self._elts)
         vfind = np.vectorize(self.find)
         roots = vfind(elts)
@@ -250,17 +254,14 @@ class UnionFind:
             A list of sets.
 
         """
-        elts = np.array(self._elts)
-        vfind = np.vectorize(self.find)
-        roots = vfind(elts)
-        distinct_roots = set(roots)
-        return [set(elts[roots == root]) for root in distinct_roots]
-        # comps = []
-        # for root in distinct_roots:
-        #     mask = (roots == root)
-        #     comp = set(elts[mask])
-        #     comps.append(comp)
-        # return comps
+        comps = {}
+        for index, elt in enumerate(self._elts):
+            root = self._find_index(index)
+            if root in comps:
+                comps[root].add(elt)
+            else:
+                comps[root] = {elt}
+        return list(comps.values())
 
     def component_mapping(self):
         """Return a dict mapping elements to their components.
@@ -307,6 +308,8 @@ class UnionFind:
             A dict with the semantics: `elt -> component contianing elt`.
 
         """
+        import numpy as np
+
         elts = np.array(self._elts)
         vfind = np.vectorize(self.find)
         roots = vfind(elts)
@@ -0,0 +1,443 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import errno
+import fcntl
+import json
+import os
+import pty
+import signal
+import struct
+import sys
+import termios
+import time
+
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import part2_ivm
+
+from diff_test import find_tests
+from part2_ivm import CompiledInstruction, InstructionType
+from verify_interactive_final_board import Verifier, make_verifier
+
+"""
+Testy trybu interaktywnego (pliki .ivml) uruchamiane bezposrednio na binarce
+gammy, bez posrednich plikow i skryptu bashowego na kazdy test.
+Wszystkie testy dzialaja w jednej petli asyncio: instrukcje skompilowane
+przez part2_ivm sa pisane na wejscie binarki, WAIT to asyncio.sleep,
+a wyjscie jest czytane rownolegle i na biezaco sprawdzane w tym samym
+procesie (verify_interactive_final_board, bez trzymania calego wyjscia
+w pamieci; z --lines bez emulacji ekranu) z plikiem .vmr obok testu.
+
+Z --pty binarka dostaje zamiast potokow pseudoterminal (isatty, termios
+dzialaja jak w prawdziwym terminalu) o rozmiarze okna --window.
+Pseudoterminale sa w puli (po jednym na zadanie) i sa uzywane ponownie;
+przed kazdym testem ustawienia terminala sa przywracane, bo binarka
+mogla skonczyc w trybie raw.
+
+Raport to jedna linia JSON na test, np.
+{"test": "a.ivml", "status": "wrong_board", "returncode": 0, "time": 0.31}
+status: ok | wrong_board | no_board (w wyjsciu nie ma planszy) | timeout |
+crash (niezerowy kod wyjscia) | invalid (test sie nie kompiluje).
+Kod wyjscia skryptu jest rowny 1 jezeli ktorykolwiek test nie przeszedl.
+
+Usage: python interactive_runner.py sciezka/do/gamma testy/ [inny.ivml ...]
+       [--jobs N] [--timeout SEKUNDY] [--nowait] [--failures-only] [--lines]
+       [--pty [--window KOLUMNYxWIERSZE]]
+"""
+
+END_OF_TRANSMISSION = bytes([4])
+# binarki wiekszosc czasu czekaja na kolejne instrukcje, wiec moze ich
+# dzialac znacznie wiecej niz jest procesorow
+DEFAULT_JOBS = 32
+# (columns, rows), typowy terminal
+DEFAULT_WINDOW = (100, 30)
+READ_SIZE = 1 << 16
+RAW_MODE_POLL = 0.001
+
+Window = Tuple[int, int]
+
+
+def expected_board_path(test_path: str) -> str:
+    return test_path.replace(".ivml", ".vmr")
+
+
+def to_send(
+    instructions: Iterable[CompiledInstruction], no_wait: bool
+) -> Iterator[CompiledInstruction]:
+    """instructions followed by EOT; without waits it is one VERBATIM block"""
+    end = CompiledInstruction(op=InstructionType.VERBATIM, text=END_OF_TRANSMISSION)
+    if not no_wait:
+        yield from instructions
+        yield end
+        return
+    verbatim = (i for i in instructions if i.op == InstructionType.VERBATIM)
+    yield from part2_ivm.coalesce([*verbatim, end])
+
+
+async def feed(
+    write: Callable[[bytes], Awaitable[None]],
+    instructions: Iterable[CompiledInstruction],
+) -> None:
+    try:
+        for instruction in instructions:
+            if instruction.op == InstructionType.VERBATIM:
+                await write(instruction.text)
+            elif instruction.op == InstructionType.WAIT:
+                await asyncio.sleep(instruction.wait_time)
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # binarka skonczyla wczesniej, o wyniku decyduje jej wyjscie
+    except OSError as e:
+        if e.errno != errno.EIO:  # pseudoterminal bez drugiej strony
+            raise
+
+
+async def feed_pipe(
+    stdin: asyncio.StreamWriter, instructions: Iterable[CompiledInstruction]
+) -> None:
+    async def write(data: bytes) -> None:
+        stdin.write(data)
+        await stdin.drain()
+
+    try:
+        await feed(write, instructions)
+    finally:
+        stdin.close()
+
+
+async def ready(fd: int, for_writing: bool = False) -> None:
+    """waits until the non-blocking fd can be read (or written)"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    add, remove = (
+        (loop.add_writer, loop.remove_writer)
+        if for_writing
+        else (loop.add_reader, loop.remove_reader)
+    )
+    add(fd, lambda: future.done() or future.set_result(None))
+    try:
+        await future
+    finally:
+        remove(fd)
+
+
+async def write_fd(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        try:
+            view = view[os.write(fd, view) :]
+        except BlockingIOError:
+            await ready(fd, for_writing=True)
+
+
+async def read_fd(fd: int, consume: Callable[[bytes], None]) -> None:
+    """until the other side of the pseudoterminal is closed"""
+    while True:
+        try:
+            chunk = os.read(fd, READ_SIZE)
+        except BlockingIOError:
+            await ready(fd)
+            continue
+        except OSError as e:
+            if e.errno == errno.EIO:
+                break
+            raise
+        if not chunk:
+            break
+        consume(chunk)
+
+
+async def read_stream(
+    stream: asyncio.StreamReader, consume: Callable[[bytes], None]
+) -> None:
+    while chunk := await stream.read(READ_SIZE):
+        consume(chunk)
+
+
+def drain_fd(fd: int) -> None:
+    """drops output left by a previous (killed) binary"""
+    try:
+        while os.read(fd, READ_SIZE):
+            pass
+    except OSError:
+        pass
+
+
+async def wait_for_raw_mode(
+    master: int, process: asyncio.subprocess.Process
+) -> None:
+    """until the binary turns canonical mode off (or exits)"""
+    while process.returncode is None and termios.tcgetattr(master)[3] & termios.ICANON:
+        await asyncio.sleep(RAW_MODE_POLL)
+
+
+class PtyPool:
+    """pseudoterminals with a fixed window size, reused by consecutive tests;
+    only the master side stays open between tests, so the end of the
+    binary's output is seen as EIO on the master"""
+
+    def __init__(self, size: int, window: Window) -> None:
+        self.window = window
+        self._free: "asyncio.Queue[Tuple[int, str]]" = asyncio.Queue()
+        self._masters: List[int] = []
+        self._attributes: List[Any] = []
+        for _ in range(size):
+            master, slave = pty.openpty()
+            self._attributes = termios.tcgetattr(slave)
+            name = os.ttyname(slave)
+            os.close(slave)
+            os.set_blocking(master, False)
+            self._masters.append(master)
+            self._free.put_nowait((master, name))
+
+    async def acquire(self) -> Tuple[int, str]:
+        return await self._free.get()
+
+    def release(self, terminal: Tuple[int, str]) -> None:
+        self._free.put_nowait(terminal)
+
+    def open_slave(self, name: str) -> int:
+        """the terminal side for the binary, with settings and window size
+        restored to the initial ones"""
+        slave = os.open(name, os.O_RDWR | os.O_NOCTTY)
+        try:
+            termios.tcsetattr(slave, termios.TCSANOW, self._attributes)
+            columns, rows = self.window
+            fcntl.ioctl(
+                slave, termios.TIOCSWINSZ, struct.pack("HHHH", rows, columns, 0, 0)
+            )
+            termios.tcflush(slave, termios.TCIOFLUSH)
+        except BaseException:
+            os.close(slave)
+            raise
+        return slave
+
+    def close(self) -> None:
+        for master in self._masters:
+            os.close(master)
+        self._masters = []
+
+
+def kill(process: asyncio.subprocess.Process) -> None:
+    """zabija cala grupe procesow - binarka moze byc np. skryptem"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def verdict(verifier: Verifier, expected_board: str) -> str:
+    final_board = verifier.finish()
+    if final_board is None:
+        return "no_board"
+    return "ok" if expected_board in final_board else "wrong_board"
+
+
+async def communicate_pipe(
+    binary: str,
+    instructions: Iterable[CompiledInstruction],
+    consume: Callable[[bytes], None],
+) -> Tuple[asyncio.subprocess.Process, Awaitable[Tuple[Any, Any, int]]]:
+    process = await asyncio.create_subprocess_exec(
+        binary,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    assert process.stdin is not None and process.stdout is not None
+    return process, asyncio.gather(
+        feed_pipe(process.stdin, instructions),
+        read_stream(process.stdout, consume),
+        process.wait(),
+    )
+
+
+async def communicate_pty(
+    binary: str,
+    instructions: Iterable[CompiledInstruction],
+    consume: Callable[[bytes], None],
+    master: int,
+    slave: int,
+) -> Tuple[asyncio.subprocess.Process, Awaitable[Tuple[Any, Any, int]]]:
+    """CRLF line ends of the terminal (ONLCR) are left to the verifier"""
+    started = False
+    try:
+        process = await asyncio.create_subprocess_exec(
+            binary, stdin=slave, stdout=slave, stderr=slave, start_new_session=True
+        )
+    finally:
+        os.close(slave)
+
+    async def write(data: bytes) -> None:
+        nonlocal started
+        if not started and (line_end := data.find(b"\n") + 1):
+            # polecenie I idzie jeszcze w trybie kanonicznym; reszte wysylamy
+            # dopiero w trybie raw, inaczej np. EOT zjadlby terminal
+            await write_fd(master, data[:line_end])
+            await wait_for_raw_mode(master, process)
+            started, data = True, data[line_end:]
+        await write_fd(master, data)
+
+    return process, asyncio.gather(
+        feed(write, instructions), read_fd(master, consume), process.wait()
+    )
+
+
+async def check_test(
+    binary: str,
+    path: str,
+    no_wait: bool,
+    timeout: Optional[float],
+    limit: asyncio.Semaphore,
+    ptys: Optional[PtyPool] = None,
+    render_screen: bool = True,
+) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"test": path}
+    # tests are read and compiled only when their turn comes, so that
+    # at most `limit` compiled scripts are kept in memory
+    async with limit:
+        try:
+            with open(path) as f:
+                raw_input = f.read()
+            with open(expected_board_path(path)) as f:
+                expected_board = f.read()
+            instructions = list(part2_ivm.DefaultCompiler().compile(raw_input))
+        except (OSError, ValueError, IndexError) as e:
+            report.update(status="invalid", error=f"{type(e).__name__}: {e}")
+            return report
+
+        to_write = to_send(instructions, no_wait)
+        verifier = make_verifier(expected_board, render_screen)
+        terminal = None
+        try:
+            start = time.monotonic()
+            if ptys is None:
+                process, communication = await communicate_pipe(
+                    binary, to_write, verifier.feed
+                )
+            else:
+                terminal = master, name = await ptys.acquire()
+                drain_fd(master)
+                slave = ptys.open_slave(name)
+                process, communication = await communicate_pty(
+                    binary, to_write, verifier.feed, master, slave
+                )
+            try:
+                _, _, returncode = await asyncio.wait_for(
+                    communication, timeout
+                )
+            except asyncio.TimeoutError:
+                kill(process)
+                await process.wait()
+                report.update(status="timeout", time=time.monotonic() - start)
+                return report
+            except BaseException:
+                kill(process)
+                raise
+        finally:
+            if ptys is not None and terminal is not None:
+                ptys.release(terminal)
+
+    report.update(returncode=returncode, time=time.monotonic() - start)
+    if returncode != 0:
+        report["status"] = "crash"
+    else:
+        report["status"] = verdict(verifier, expected_board)
+    return report
+
+
+async def run(
+    binary: str,
+    tests: List[str],
+    jobs: int,
+    no_wait: bool,
+    timeout: Optional[float],
+    failures_only: bool,
+    window: Optional[Window] = None,
+    render_screen: bool = True,
+) -> Dict[str, int]:
+    """prints the report as the tests finish; returns status counts;
+    with a window size the binary runs on pseudoterminals"""
+    limit = asyncio.Semaphore(jobs)
+    ptys = None if window is None else PtyPool(min(jobs, len(tests)), window)
+    checks = [
+        check_test(binary, path, no_wait, timeout, limit, ptys, render_screen)
+        for path in tests
+    ]
+    counts: Dict[str, int] = {}
+    try:
+        for check in asyncio.as_completed(checks):
+            result = await check
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            if result["status"] != "ok" or not failures_only:
+                print(json.dumps(result), flush=True)
+    finally:
+        if ptys is not None:
+            ptys.close()
+    return counts
+
+
+def parse_window(text: str) -> Window:
+    columns, rows = map(int, text.lower().split("x"))
+    return columns, rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="run interactive mode tests (.ivml) on a gamma binary"
+    )
+    parser.add_argument("binary")
+    parser.add_argument("tests", nargs="+", help=".ivml files or directories")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--nowait", action="store_true", help="ignore WAIT")
+    parser.add_argument("--failures-only", action="store_true")
+    parser.add_argument("--pty", action="store_true", help="run on pseudoterminals")
+    parser.add_argument(
+        "--window",
+        type=parse_window,
+        default=DEFAULT_WINDOW,
+        help="pseudoterminal size COLUMNSxROWS",
+    )
+    parser.add_argument(
+        "--lines", action="store_true", help="skip escapes instead of rendering"
+    )
+    args = parser.parse_args()
+
+    binary = os.path.abspath(args.binary)
+    if not os.access(binary, os.X_OK):
+        exit(f"{args.binary} nie jest plikiem wykonywalnym")
+
+    tests = list(find_tests(args.tests, suffix=".ivml"))
+    counts = asyncio.run(
+        run(
+            binary,
+            tests,
+            args.jobs,
+            args.nowait,
+            args.timeout,
+            args.failures_only,
+            args.window if args.pty else None,
+            not args.lines,
+        )
+    )
+
+    summary = ", ".join(f"{k}: {v}" for k, v in sorted(counts.items()))
+    print(f"{len(tests)} tests; {summary}", file=sys.stderr)
+    sys.exit(int(counts.get("ok", 0) != len(tests)))
+
+
+if __name__ == "__main__":
+    main()
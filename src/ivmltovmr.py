@@ -2,6 +2,8 @@ import sys
 
 from typing import List, Optional
 
+import output_cache
+
 from part1 import Gamma, gamma_board, gamma_golden_move, gamma_move, gamma_new
 from part1tovm import PlayerPointer
 
@@ -52,8 +54,7 @@ class Interpreter:
         if cmd == "SKIPTURN":
             self.player.advance()
         if cmd == "SKIPTURNS":
-            for _ in range(int(tokens[1])):
-                self.player.advance()
+            self.player.skip(int(tokens[1]))
         if cmd in {"UP", "DOWN", "LEFT", "RIGHT"}:
             self.react_to_array_key(cmd)
 
@@ -66,8 +67,8 @@ class Interpreter:
                 break
 
 
-def main() -> None:
-    statements = sys.stdin.read().splitlines()
+def replay(raw_input: str) -> None:
+    statements = raw_input.splitlines()
     statements = [s.strip() for s in statements if s.strip() and s[0] != "#"]
     interpreter = Interpreter()
     interpreter.run(statements)
@@ -75,5 +76,16 @@ def main() -> None:
     print(gamma_board(interpreter.g), end="")
 
 
+def main() -> None:
+    raw_input = sys.stdin.read()
+    force = any("force" in arg for arg in sys.argv)
+    output_cache.run_cached(
+        "ivmltovmr",
+        [raw_input.encode(), str(force).encode()],
+        ["ivmltovmr.py", "part1tovm.py"],
+        lambda: replay(raw_input),
+    )
+
+
 if __name__ == "__main__":
     main()
@@ -1,7 +1,11 @@
+import argparse
+import hashlib
 import json
+import random
 import sys
 
-from typing import Any, Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, TextIO, Tuple
 
 from test_scenarios import scenarios
 from test_tools import (
@@ -9,58 +13,203 @@ from test_tools import (
     make_comment,
     make_random_id,
     make_statements_dispatcher,
+    make_table_statements_dispatcher,
 )
 
 OUTPUT_DIR = "out/"  # TODO
 
+Templates = Tuple[str, str]
+
+# szablony wczytane raz na proces roboczy w trybie --bulk
+worker_templates: Optional[Templates] = None
+
+
+def load_templates(table: bool = False) -> Templates:
+    c_template_path = "templates/c_table_file_template" if table else (
+        "templates/c_file_template"
+    )
+    with open(c_template_path, "r") as f:
+        c_file_template = f.read()
+    with open("templates/py_file_template", "r") as f:
+        py_file_template = f.read()
+
+    return c_file_template, py_file_template
+
+
+def derive_seed(base_seed: int, index: int) -> int:
+    digest = hashlib.sha256(f"{base_seed}:{index}".encode()).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def split_template(template: str) -> Tuple[str, str]:
+    """returns the parts of the template before and after the {} placeholder"""
+    head, tail = template.format("\0").split("\0")
+    return head, tail
+
 
 def make_tests(
-    scenario: ScenarioType, unique_id: str, extras: Dict[str, Any]
-) -> Tuple[List[str], List[str]]:
-    spython: List[str] = []
-    sclang: List[str] = []
-    store = make_statements_dispatcher(spython, sclang)
+    scenario: ScenarioType,
+    unique_id: str,
+    seed: int,
+    extras: Dict[str, Any],
+    c_output: TextIO,
+    py_output: TextIO,
+    table: bool = False,
+) -> None:
+    if table:
+        store, finish = make_table_statements_dispatcher(py_output, c_output)
+    else:
+        store, finish = make_statements_dispatcher(py_output, c_output), None
 
     scenario_name = [k for k in scenarios if scenarios[k] == scenario][0]
-    store(make_comment(f"scenario: {scenario_name}\nuuid: {unique_id}"))
+    store(make_comment(f"scenario: {scenario_name}\nuuid: {unique_id}\nseed: {seed}"))
     scenario(store, **extras)
 
-    return sclang, spython
+    if finish is not None:
+        finish()
 
 
 def run_scenario(
-    output_file_name: str, scenario: ScenarioType, extras: Dict[str, Any]
+    output_file_name: str,
+    scenario: ScenarioType,
+    extras: Dict[str, Any],
+    seed: Optional[int] = None,
+    templates: Optional[Templates] = None,
+    table: bool = False,
 ) -> None:
-    with open("templates/c_file_template", "r") as f:
-        c_file_template = f.read()
-    with open("templates/py_file_template", "r") as f:
-        py_file_template = f.read()
+    """table - C asserts are emitted as a static table of records
+    checked in a loop, which keeps huge tests fast to compile"""
+    c_file_template, py_file_template = templates or load_templates(table)
+
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    random.seed(seed)
 
     test_id = make_random_id()
     if output_file_name == "AUTO":
         output_file_name = test_id
 
-    c_statements, py_statements = make_tests(scenario, test_id, extras)
-    output_file_c = c_file_template.format("\n".join(c_statements))
-    output_file_py = py_file_template.format("\n".join(py_statements))
-
-    with open(OUTPUT_DIR + output_file_name + ".c", "w") as f:
-        f.write(output_file_c)
-
-    with open(OUTPUT_DIR + output_file_name + ".py", "w") as f:
-        f.write(output_file_py)
+    c_head, c_tail = split_template(c_file_template)
+    py_head, py_tail = split_template(py_file_template)
+
+    with open(OUTPUT_DIR + output_file_name + ".c", "w") as c_output, open(
+        OUTPUT_DIR + output_file_name + ".py", "w"
+    ) as py_output:
+        c_output.write(c_head)
+        py_output.write(py_head)
+        make_tests(scenario, test_id, seed, extras, c_output, py_output, table)
+        c_output.write(c_tail)
+        py_output.write(py_tail)
+
+
+def init_worker(table: bool) -> None:
+    global worker_templates
+    worker_templates = load_templates(table)
+
+
+def run_bulk_job(job: Tuple[str, str, Dict[str, Any], int, bool]) -> str:
+    output_file_name, scenario_name, extras, seed, table = job
+    run_scenario(
+        output_file_name,
+        scenarios[scenario_name],
+        extras,
+        seed,
+        worker_templates,
+        table,
+    )
+    return output_file_name
+
+
+def run_bulk(
+    prefix: str,
+    scenario_name: str,
+    count: int,
+    extras: Dict[str, Any],
+    base_seed: int,
+    jobs: Optional[int] = None,
+    table: bool = False,
+) -> None:
+    digits = len(str(count - 1))
+    bulk_jobs = [
+        (
+            f"{prefix}{i:0{digits}d}",
+            scenario_name,
+            extras,
+            derive_seed(base_seed, i),
+            table,
+        )
+        for i in range(count)
+    ]
+
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=init_worker, initargs=(table,)
+    ) as executor:
+        for output_file_name in executor.map(run_bulk_job, bulk_jobs):
+            print(output_file_name)
+
+
+def bulk_main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python make_tests.py --bulk",
+        description="generate many tests of one scenario, each with its own seed",
+    )
+    parser.add_argument("prefix", help="output files are prefix000.c, prefix000.py...")
+    parser.add_argument("scenario", choices=list(scenarios.keys()))
+    parser.add_argument("count", type=int)
+    parser.add_argument("extras", nargs="?", default="{}", help="scenario kwargs json")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--table", action="store_true", help="table-driven C test")
+    args = parser.parse_args(argv)
+
+    base_seed = args.seed
+    if base_seed is None:
+        base_seed = random.SystemRandom().getrandbits(64)
+
+    run_bulk(
+        args.prefix,
+        args.scenario,
+        args.count,
+        json.loads(args.extras),
+        base_seed,
+        args.jobs,
+        args.table,
+    )
+    print(f"base seed: {base_seed}", file=sys.stderr)
 
 
 def main() -> None:
-    if len(sys.argv) < 3:
+    if len(sys.argv) > 1 and sys.argv[1] == "--bulk":
+        bulk_main(sys.argv[2:])
+        return
+
+    table = "--table" in sys.argv
+    argv = [arg for arg in sys.argv if arg != "--table"]
+
+    # seed from the header of a generated test regenerates exactly that test
+    seed: Optional[int] = None
+    if "--seed" in argv:
+        position = argv.index("--seed")
+        try:
+            seed = int(argv[position + 1])
+        except (IndexError, ValueError):
+            print("--seed needs an integer")
+            sys.exit(1)
+        del argv[position : position + 2]
+
+    if len(argv) < 3:
         print(
-            "usage: python make_tests.py output_file scenario\n"
-            "[without extension, will generate output_file.c and output_file.py]"
+            "usage: python make_tests.py output_file scenario [extras_json] [--table]\n"
+            "       [--seed seed]\n"
+            "[without extension, will generate output_file.c and output_file.py]\n"
+            "       python make_tests.py --bulk prefix scenario count [extras_json]\n"
+            "       [--seed base_seed] [--jobs workers] [--table]\n"
+            "--table emits C asserts as a compact table checked in a loop"
         )
         sys.exit(1)
 
     try:
-        chosen_scenario: ScenarioType = scenarios[sys.argv[2]]
+        chosen_scenario: ScenarioType = scenarios[argv[2]]
     except KeyError:
         print(
             "scenario name not recognized\n"
@@ -68,8 +217,8 @@ def main() -> None:
         )
         sys.exit(1)
 
-    extra_arguments = {} if len(sys.argv) == 3 else json.loads(sys.argv[3])
-    run_scenario(sys.argv[1], chosen_scenario, extra_arguments)
+    extra_arguments = {} if len(argv) == 3 else json.loads(argv[3])
+    run_scenario(argv[1], chosen_scenario, extra_arguments, seed=seed, table=table)
 
 
 if __name__ == "__main__":
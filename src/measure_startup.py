@@ -0,0 +1,73 @@
+import subprocess
+import sys
+
+from typing import Dict, List, Tuple
+
+"""
+Mierzy czas importu narzedzi CLI przez `python -X importtime`.
+Dla kazdego modulu wypisuje sumaryczny czas importu (najlepszy z kilku
+prob) i zaznacza, jezeli przy okazji zaimportowany zostal numpy
+- zaden z modulow ponizej nie powinien go potrzebowac.
+
+Usage: python measure_startup.py [ile_powtorzen] [modul ...]
+"""
+
+ENTRY_POINTS = [
+    "part2",
+    "part1tovm",
+    "part1topart2",
+    "ivmltovmr",
+    "part1_to_part3",
+    "make_tests",
+    "oracle_server",
+]
+
+HEAVY_MODULES = {"numpy", "pyte"}
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """zwraca modul -> skumulowany czas importu w mikrosekundach"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(module: str, repeat: int) -> Tuple[int, List[str]]:
+    best = None
+    heavy: List[str] = []
+    for _ in range(repeat):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            raise RuntimeError(f"import {module} failed:\n{process.stderr}")
+
+        times = parse_importtime(process.stderr)
+        heavy = sorted(HEAVY_MODULES & times.keys())
+        if best is None or times[module] < best:
+            best = times[module]
+
+    assert best is not None
+    return best, heavy
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    repeat = int(args.pop(0)) if args and args[0].isdigit() else 5
+    modules = args or ENTRY_POINTS
+
+    for module in modules:
+        best, heavy = measure(module, repeat)
+        note = f"  [imports {', '.join(heavy)}]" if heavy else ""
+        print(f"{module:<20}{best / 1000:>9.2f} ms{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import sys
+
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List
+
+import part2_ivm
+
+from ivmltovmr import Interpreter
+from part1tovm import PlayerPointer
+from part2_ivm import CompiledInstruction, InstructionType
+
+"""
+Optymalizacja skryptow interactive mode (.ivml -> .ivml) bez zmiany
+koncowej planszy:
+- ruchy kursora (GOTO, strzalki) pomiedzy akcjami zamieniane sa na jedno
+  GOTO do pozycji koncowej albo usuwane, jezeli kursor juz tam jest
+  (poza pierwszym GOTO po START - patrz part2_ivm),
+- SKIPTURN/SKIPTURNS pomiedzy akcjami (takze rozdzielone ruchami kursora)
+  sa laczone w jedno SKIPTURNS, a SKIPTURNS 0 usuwane,
+- liczba pominiec jest brana modulo liczba graczy, ktorzy moga sie ruszyc
+  (gra jest symulowana jak w ivmltovmr; po SENDCODE symulacja nie jest
+  juz wiarygodna i pominiecia nie sa skracane),
+- SETWAIT jest wypisywane tylko wtedy, gdy zmienia czas czekania
+  instrukcji, ktora po nim nastepuje; puste linie i komentarze znikaja.
+Kazda instrukcja ma takie samo czekanie jak w skrypcie wejsciowym.
+
+Na stderr wypisywane jest, ile klawiszy (strzalka to jeden klawisz)
+i sekund czekania usunieto.
+
+Usage: python optimize_ivml.py < test.ivml > zoptymalizowany.ivml
+"""
+
+CURSOR_STATEMENTS = {"GOTO", "UP", "DOWN", "LEFT", "RIGHT"}
+SKIP_STATEMENTS = {"SKIPTURN", "SKIPTURNS"}
+ARROW_PREFIX = bytes([27, 91])
+
+
+@dataclass()
+class Cost:
+    keystrokes: int = 0
+    seconds: float = 0.0
+
+    def add(self, instructions: Iterable[CompiledInstruction]) -> None:
+        for instruction in instructions:
+            if instruction.op == InstructionType.VERBATIM:
+                text = instruction.text
+                self.keystrokes += len(text) - 2 * text.count(ARROW_PREFIX)
+            elif instruction.op == InstructionType.WAIT:
+                self.seconds += instruction.wait_time
+
+
+class Optimizer:
+    # kursor i czas czekania wedlug skryptu wejsciowego i wyjsciowego
+    source: part2_ivm.Compiler
+    target: part2_ivm.Compiler
+
+    def __init__(self) -> None:
+        self.source = part2_ivm.DefaultCompiler()
+        self.target = part2_ivm.DefaultCompiler()
+        self.source.reset()
+        self.target.reset()
+        self.input_cost = Cost()
+        self.output_cost = Cost()
+        # stan gry po instrukcjach wypisanych do tej pory
+        self.game = Interpreter()
+        self.simulate = True
+
+        self._moved = False
+        # pierwszy ruch kursora po START zostaje zawsze (GOTO 0 0 dla przenosnosci)
+        self._after_start = False
+        self._cursor_wait = 0.0
+        self._skips = 0
+        self._skips_wait = 0.0
+
+    def _emit(self, tokens: List[str], wait: float) -> Iterator[str]:
+        if tokens[0] != "SETWAIT" and wait != self.target.wait_time:
+            yield from self._emit(["SETWAIT", str(wait)], wait)
+
+        self.output_cost.add(self.target.compile_statement(tokens))
+        statement = " ".join(tokens)
+        if tokens[0] == "SENDCODE":
+            self.simulate = False
+        if self.simulate:
+            try:
+                self.game.run_statement(statement)
+            except AssertionError:  # np. START, dla ktorego gamma_new zwraca NULL
+                self.simulate = False
+        yield statement
+
+    def _fold(self, skips: int) -> int:
+        """the smallest number of skips reaching the same player"""
+        player = self.game.player
+        if not (skips and self.simulate and player is not None):
+            return skips
+        assert player.game is not None
+        if not player.game.movable_players():
+            return skips  # gra sie skonczyla, tego nie symulujemy
+
+        pointer = PlayerPointer(player.current, player.game)
+        pointer.skip(skips)
+        folded = player.count_skips_to_player(pointer.current)
+        assert folded is not None
+        return folded
+
+    def _flush(self) -> Iterator[str]:
+        """pending cursor moves and skips, before an action"""
+        position = (self.source.x, self.source.y)
+        moved = position != (self.target.x, self.target.y) or self._after_start
+        if self._moved and moved:
+            yield from self._emit(["GOTO", *map(str, position)], self._cursor_wait)
+        self._moved = self._after_start = False
+
+        skips = self._fold(self._skips)
+        if skips:
+            yield from self._emit(["SKIPTURNS", str(skips)], self._skips_wait)
+        self._skips = 0
+
+    def optimize(self, lines: Iterable[str]) -> Iterator[str]:
+        for line in lines:
+            tokens = line.split()
+            if not tokens or tokens[0].startswith("#"):
+                continue
+
+            self.input_cost.add(self.source.compile_statement(tokens))
+            statement, wait = tokens[0], self.source.wait_time
+            if statement == "SETWAIT":
+                continue
+            if statement in CURSOR_STATEMENTS:
+                self._moved, self._cursor_wait = True, wait
+                continue
+            if statement in SKIP_STATEMENTS:
+                self._skips += 1 if statement == "SKIPTURN" else int(tokens[1])
+                self._skips_wait = wait
+                continue
+
+            yield from self._flush()
+            yield from self._emit(tokens, wait)
+            self._after_start = statement == "START"
+            if statement == "END":
+                return
+
+        yield from self._flush()
+
+
+def main() -> None:
+    optimizer = Optimizer()
+    try:
+        for statement in optimizer.optimize(sys.stdin):
+            print(statement)
+    except ValueError as e:
+        exit(f"Niepoprawny skrypt: {e}")
+
+    before, after = optimizer.input_cost, optimizer.output_cost
+    print(
+        f"removed {before.keystrokes - after.keystrokes} keystrokes "
+        f"({before.keystrokes} -> {after.keystrokes}) and "
+        f"{before.seconds - after.seconds:.2f} s of waiting "
+        f"({before.seconds:.2f} s -> {after.seconds:.2f} s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
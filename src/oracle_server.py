@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import argparse
+import io
+import itertools
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+
+from collections import OrderedDict
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Any, Callable, Dict, Optional, TextIO
+
+import part1
+import part2
+
+"""
+Dlugo zyjacy serwer wzorcowej implementacji (part1/part2), zeby skrypty
+testujace nie placily za start interpretera i import silnika przy kazdym
+zapytaniu.
+
+Protokol: jedno zapytanie JSON na linie, jedna odpowiedz JSON na linie.
+    {"op": "ping"}
+    {"op": "batch", "input": "B 3 3 2 1\\nm 1 0 0\\n"}
+        -> {"ok": true, "stdout": "OK 1\\n1\\n", "stderr": ""}
+    {"op": "new", "args": [3, 3, 2, 1]}      -> {"ok": true, "game": 1}
+    {"op": "call", "game": 1, "fn": "gamma_move", "args": [1, 0, 0]}
+        -> {"ok": true, "result": 1}
+    {"op": "delete", "game": 1}              -> {"ok": true}
+bledne zapytanie -> {"ok": false, "error": "..."}
+
+Usage:
+    python oracle_server.py --socket /tmp/gamma.sock      # unix socket
+    python oracle_server.py --stdio                       # stdin/stdout
+    python oracle_server.py --client /tmp/gamma.sock < test.in \\
+        1>test.out 2>test.err                              # batch przez serwer
+"""
+
+GAME_API: Dict[str, Callable[..., Any]] = {
+    "gamma_move": part1.gamma_move,
+    "gamma_golden_move": part1.gamma_golden_move,
+    "gamma_busy_fields": part1.gamma_busy_fields,
+    "gamma_free_fields": part1.gamma_free_fields,
+    "gamma_golden_possible": part1.gamma_golden_possible,
+    "gamma_board": part1.gamma_board,
+}
+
+# part2 trzyma plansze w zmiennej globalnej i pisze na sys.stdout/stderr,
+# wiec wszystkie operacje na silniku ida pojedynczo
+ENGINE_LOCK = threading.Lock()
+
+
+class OracleError(Exception):
+    pass
+
+
+class GamePool:
+    """cieple instancje gier trzymane pomiedzy zapytaniami;
+    po przekroczeniu limitu usuwana jest najdawniej uzywana gra"""
+
+    games: "OrderedDict[int, part1.Gamma]"
+
+    def __init__(self, max_games: int = 1024) -> None:
+        self.max_games = max_games
+        self.games = OrderedDict()
+        self._ids = itertools.count(1)
+
+    def new(self, width: int, height: int, players: int, areas: int) -> Optional[int]:
+        game = part1.gamma_new(width, height, players, areas)
+        if game is None:
+            return None
+
+        game_id = next(self._ids)
+        self.games[game_id] = game
+        while len(self.games) > self.max_games:
+            self.games.popitem(last=False)
+        return game_id
+
+    def get(self, game_id: int) -> part1.Gamma:
+        try:
+            game = self.games[game_id]
+        except KeyError:
+            raise OracleError(f"unknown game {game_id}")
+        self.games.move_to_end(game_id)
+        return game
+
+    def delete(self, game_id: int) -> None:
+        if self.games.pop(game_id, None) is None:
+            raise OracleError(f"unknown game {game_id}")
+
+
+def run_batch(statements: str) -> Dict[str, Any]:
+    out, err = io.StringIO(), io.StringIO()
+    with redirect_stdout(out), redirect_stderr(err):
+        part2.run_statements(statements)
+    return {"stdout": out.getvalue(), "stderr": err.getvalue()}
+
+
+def call_game(pool: GamePool, game_id: int, fn: str, args: Any) -> Any:
+    try:
+        f = GAME_API[fn]
+    except KeyError:
+        raise OracleError(f"unknown function {fn}")
+
+    result = f(pool.get(game_id), *map(int, args))
+    return int(result) if isinstance(result, bool) else result
+
+
+def handle_request(pool: GamePool, request: Dict[str, Any]) -> Dict[str, Any]:
+    op = request.get("op")
+    with ENGINE_LOCK:
+        if op == "ping":
+            return {}
+        if op == "batch":
+            return run_batch(str(request["input"]))
+        if op == "new":
+            return {"game": pool.new(*map(int, request["args"]))}
+        if op == "call":
+            return {
+                "result": call_game(
+                    pool, int(request["game"]), request["fn"], request.get("args", [])
+                )
+            }
+        if op == "delete":
+            pool.delete(int(request["game"]))
+            return {}
+
+    raise OracleError(f"unknown op {op}")
+
+
+def handle_line(pool: GamePool, line: str) -> str:
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise OracleError("request must be a json object")
+        response = {"ok": True, **handle_request(pool, request)}
+    except (OracleError, ValueError, TypeError, KeyError) as e:
+        response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    return json.dumps(response)
+
+
+def serve_stream(pool: GamePool, requests: TextIO, responses: TextIO) -> None:
+    for line in requests:
+        if not line.strip():
+            continue
+        responses.write(handle_line(pool, line) + "\n")
+        responses.flush()
+
+
+def make_server(path: str, pool: GamePool) -> socketserver.ThreadingUnixStreamServer:
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            for raw_line in self.rfile:
+                line = raw_line.decode("UTF-8")
+                if not line.strip():
+                    continue
+                self.wfile.write((handle_line(pool, line) + "\n").encode("UTF-8"))
+                self.wfile.flush()
+
+    if os.path.exists(path):
+        os.unlink(path)
+
+    server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    server.daemon_threads = True
+    return server
+
+
+def warm_up() -> None:
+    """przechodzi raz przez wszystkie komendy, zeby pierwsze prawdziwe
+    zapytanie nie placilo za leniwe importy i inicjalizacje"""
+    run_batch("B 3 3 2 1\nm 1 0 0\nm 2 2 2\ng 2 0 0\nb 1\nf 2\nq 1\np\n")
+
+
+class OracleClient:
+    """klient dla skryptow w pythonie; jedno polaczenie, wiele zapytan"""
+
+    def __init__(self, path: str) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.stream = self.sock.makefile("rw", encoding="UTF-8")
+
+    def query(self, **request: Any) -> Dict[str, Any]:
+        self.stream.write(json.dumps(request) + "\n")
+        self.stream.flush()
+        response: Dict[str, Any] = json.loads(self.stream.readline())
+        if not response.pop("ok", False):
+            raise OracleError(response.get("error"))
+        return response
+
+    def batch(self, statements: str) -> Dict[str, Any]:
+        return self.query(op="batch", input=statements)
+
+    def close(self) -> None:
+        self.stream.close()
+        self.sock.close()
+
+
+def run_client(path: str) -> None:
+    client = OracleClient(path)
+    try:
+        response = client.batch(sys.stdin.read())
+    finally:
+        client.close()
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="gamma reference oracle server")
+    transport = parser.add_mutually_exclusive_group(required=True)
+    transport.add_argument("--socket", help="path of the unix socket to listen on")
+    transport.add_argument("--stdio", action="store_true", help="serve stdin/stdout")
+    transport.add_argument("--client", help="send stdin as a batch to a server")
+    parser.add_argument("--max-games", type=int, default=1024)
+    args = parser.parse_args()
+
+    if args.client:
+        run_client(args.client)
+        return
+
+    pool = GamePool(args.max_games)
+    warm_up()
+
+    if args.stdio:
+        serve_stream(pool, sys.stdin, sys.stdout)
+        return
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    with make_server(args.socket, pool) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import glob
+import hashlib
+import io
+import os
+import struct
+import sys
+import tempfile
+
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+"""
+Cache wygenerowanych wynikow (stdout + stderr) narzedzi CLI, adresowany
+trescia: kluczem jest hash wejscia, argumentow wplywajacych na wynik
+oraz zrodel silnika i samego narzedzia. Zmiana silnika uniewaznia
+wiec wszystkie wpisy bez recznego czyszczenia.
+
+Konfiguracja przez zmienne srodowiskowe:
+SPRAWDZARKA_CACHE_DIR   katalog cache (domyslnie ~/.cache/ipp-sprawdzarka)
+SPRAWDZARKA_CACHE_SIZE  limit rozmiaru w bajtach (domyslnie 512 MiB),
+                        po przekroczeniu usuwane sa najdawniej uzyte wpisy
+SPRAWDZARKA_NO_CACHE    jezeli ustawione na cokolwiek niepustego,
+                        cache jest wylaczony
+"""
+
+SOURCES_ROOT = os.path.dirname(os.path.abspath(__file__))
+ENGINE_SOURCES = ["part1.py", "gamma/*.py"]
+
+CACHE_DIR = os.environ.get(
+    "SPRAWDZARKA_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "ipp-sprawdzarka"),
+)
+MAX_CACHE_SIZE = int(os.environ.get("SPRAWDZARKA_CACHE_SIZE", 512 * 1024 * 1024))
+# po przekroczeniu limitu cache jest przycinany do tego ulamka limitu
+EVICTION_TARGET = 0.8
+# przyblizony laczny rozmiar wpisow, powiekszany przy kazdym store; caly
+# katalog jest przegladany (i rozmiar liczony dokladnie) dopiero wtedy,
+# gdy przyblizenie przekroczy limit
+SIZE_FILE = "size"
+
+_HEADER = struct.Struct("<Q")
+_sources_hashes: Dict[Tuple[str, ...], str] = {}
+
+
+def is_enabled() -> bool:
+    return not os.environ.get("SPRAWDZARKA_NO_CACHE") and MAX_CACHE_SIZE > 0
+
+
+def sources_hash(patterns: Iterable[str]) -> str:
+    all_patterns = tuple(ENGINE_SOURCES) + tuple(patterns)
+    if all_patterns not in _sources_hashes:
+        digest = hashlib.sha256()
+        for pattern in all_patterns:
+            for path in sorted(glob.glob(os.path.join(SOURCES_ROOT, pattern))):
+                digest.update(os.path.relpath(path, SOURCES_ROOT).encode())
+                with open(path, "rb") as f:
+                    digest.update(hashlib.sha256(f.read()).digest())
+        _sources_hashes[all_patterns] = digest.hexdigest()
+    return _sources_hashes[all_patterns]
+
+
+def make_key(tool: str, inputs: Iterable[bytes], sources: Iterable[str]) -> str:
+    digest = hashlib.sha256(tool.encode())
+    digest.update(sources_hash(sources).encode())
+    for data in inputs:
+        digest.update(_HEADER.pack(len(data)))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, key[:2], key)
+
+
+def load(key: str) -> Optional[Tuple[bytes, bytes]]:
+    path = _entry_path(key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)  # mtime sluzy jako czas ostatniego uzycia
+    except OSError:
+        return None
+
+    if len(data) < _HEADER.size:
+        return None
+    (out_length,) = _HEADER.unpack_from(data)
+    body = data[_HEADER.size :]
+    return body[:out_length], body[out_length:]
+
+
+def _write_atomically(path: str, *chunks: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _read_total_size() -> Optional[int]:
+    try:
+        with open(os.path.join(CACHE_DIR, SIZE_FILE)) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_total_size(total: int) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _write_atomically(os.path.join(CACHE_DIR, SIZE_FILE), str(total).encode())
+
+
+def store(key: str, out: bytes, err: bytes) -> None:
+    path = _entry_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_atomically(path, _HEADER.pack(len(out)), out, err)
+
+    # rownolegle procesy moga zgubic swoje przyrosty, dokladna wartosc
+    # przywraca najblizszy evict()
+    total = _read_total_size()
+    if total is None:
+        evict()
+        return
+    total += _HEADER.size + len(out) + len(err)
+    if total > MAX_CACHE_SIZE:
+        evict()
+    else:
+        _write_total_size(total)
+
+
+def evict(max_size: int = MAX_CACHE_SIZE) -> None:
+    """removes the least recently used entries if the cache is over
+    the limit and records the exact total size"""
+    entries: List[Tuple[float, int, str]] = []
+    total = 0
+    for directory in glob.glob(os.path.join(CACHE_DIR, "??")):
+        for entry in os.scandir(directory):
+            if entry.name.startswith(".tmp"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:  # usuniety rownolegle przez inny proces
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+    if total <= max_size:
+        _write_total_size(total)
+        return
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_size * EVICTION_TARGET:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        total -= size
+    _write_total_size(total)
+
+
+def cached_output(
+    tool: str,
+    inputs: Iterable[bytes],
+    sources: Iterable[str],
+    compute: Callable[[], None],
+) -> Tuple[str, str]:
+    """jak run_cached, ale zwraca (stdout, stderr) zamiast je wypisywac;
+    do uzycia wewnatrz innych narzedzi"""
+    key = make_key(tool, inputs, sources) if is_enabled() else None
+    cached = None if key is None else load(key)
+    if cached is not None:
+        return cached[0].decode(), cached[1].decode()
+
+    out, err = io.StringIO(), io.StringIO()
+    with redirect_stdout(out), redirect_stderr(err):
+        compute()
+
+    if key is not None:
+        store(key, out.getvalue().encode(), err.getvalue().encode())
+    return out.getvalue(), err.getvalue()
+
+
+def run_cached(
+    tool: str,
+    inputs: Iterable[bytes],
+    sources: Iterable[str],
+    compute: Callable[[], None],
+) -> None:
+    """uruchamia compute() - ktore pisze wynik na stdout/stderr - albo
+    odtwarza jego zapamietany wynik; jezeli compute() zakonczy sie
+    wyjatkiem (np. exit z bledem), wynik nie jest zapamietywany"""
+    if not is_enabled():
+        compute()
+        return
+
+    key = make_key(tool, inputs, sources)
+    cached = load(key)
+    if cached is not None:
+        sys.stdout.write(cached[0].decode())
+        sys.stderr.write(cached[1].decode())
+        return
+
+    out, err = io.StringIO(), io.StringIO()
+    try:
+        with redirect_stdout(out), redirect_stderr(err):
+            compute()
+    finally:
+        sys.stdout.write(out.getvalue())
+        sys.stderr.write(err.getvalue())
+
+    store(key, out.getvalue().encode(), err.getvalue().encode())
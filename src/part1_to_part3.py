@@ -1,30 +1,167 @@
-# type: ignore
-
 from __future__ import annotations
 
+import argparse
+import io
+import os
 import re
 import sys
-from typing import Any, List
+import tempfile
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import output_cache
+import part1
+import part1topart2
 
 """
 Najpierw conwersja c -> py convert_to_py.
+Potem asercje gamma_golden_possible w tescie C sa zastepowane wynikami
+wzorcowego silnika: test py jest odtwarzany (bez exec, wywolania rozpoznaje
+part1topart2) rownolegle z jednym przejsciem po pliku C.
+
+Usage: python part1_to_part3.py sciezka/do/testu.py sciezka/do/testu.c > test.c
+       python part1_to_part3.py --dir testy_c/ testy_py/ wyjscie/ [--jobs N]
+       (dla kazdego testy_c/X.c bierze testy_py/X.py i pisze wyjscie/X.c)
 """
 
-STATEMENTS: List[str] = []
+GOLDEN_POSSIBLE = "gamma_golden_possible"
+BOARD_NAME = re.compile(r"(?<=gamma_golden_possible\()\w+")
+# zrodla, od ktorych zalezy wynik (klucz cache)
+CACHE_SOURCES = ["part1_to_part3.py", "part1topart2.py"]
+
+
+def golden_possible_results(test_lines: Iterable[str]) -> Iterator[Tuple[int, int]]:
+    """replays the py test on the engine; yields (player, result)
+    of its gamma_golden_possible calls"""
+    variables: Dict[str, Any] = {}
+    for number, target, name, arguments in part1topart2.recognise_calls(test_lines):
+        if name not in part1topart2.TRANSLATORS:
+            raise ValueError(f"line {number}: unknown function {name}")
+        try:
+            values = [variables[a] if isinstance(a, str) else a for a in arguments]
+        except KeyError as e:
+            raise ValueError(f"line {number}: name {e} is not defined")
+
+        result = getattr(part1, name)(*values)
+        if target is not None:
+            variables[target] = result
+        if name == GOLDEN_POSSIBLE:
+            yield values[1], int(result)
 
-correct_golden_possible: Any
 
+def merge_lines(test_lines: Iterable[str], c_lines: Iterable[str], out: TextIO) -> None:
+    results = golden_possible_results(test_lines)
+    for number, line in enumerate(c_lines, start=1):
+        if GOLDEN_POSSIBLE not in line:
+            out.write(line + "\n")
+            continue
 
-def gamma_golden_possible(g: Any, player: Any) -> Any:
-    res = int(correct_golden_possible(g, player))
-    STATEMENTS.append(f"assert(gamma_golden_possible({{}}, {player}) == {res});")
+        board = BOARD_NAME.search(line)
+        if board is None:
+            raise ValueError(f"C line {number}: unrecognised {GOLDEN_POSSIBLE} call")
+        result = next(results, None)
+        if result is None:
+            raise ValueError(f"C line {number}: no matching {GOLDEN_POSSIBLE} in py")
+        player, res = result
+        out.write(f"assert({GOLDEN_POSSIBLE}({board[0]}, {player}) == {res});\n")
+
+
+def merge(test: str, c_test: str) -> None:
+    if GOLDEN_POSSIBLE not in c_test:
+        print(c_test)
+        return
+    merge_lines(io.StringIO(test), io.StringIO(c_test), sys.stdout)
+
+
+def merge_file(py_path: str, c_path: str, out_path: str) -> None:
+    """like the single test mode (and with the same cache entries),
+    but the result goes to out_path"""
+    with open(c_path) as f:
+        c_test = f.read()
+    test = ""
+    if GOLDEN_POSSIBLE in c_test or os.path.exists(py_path):
+        with open(py_path) as f:
+            test = f.read()
+
+    merged, _ = output_cache.cached_output(
+        "part1_to_part3",
+        [test.encode(), c_test.encode()],
+        CACHE_SOURCES,
+        lambda: merge(test, c_test),
+    )
+
+    out_dir = os.path.dirname(out_path) or "."
+    os.makedirs(out_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, prefix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as out:
+            out.write(merged)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def merge_job(job: Tuple[str, str, str]) -> Optional[str]:
+    """returns an error message instead of raising, so that
+    one broken test does not stop the others"""
+    py_path, c_path, out_path = job
+    try:
+        merge_file(py_path, c_path, out_path)
+    except Exception as e:
+        return f"{c_path}: {type(e).__name__}: {e}"
+    return None
+
+
+def find_jobs(c_dir: str, py_dir: str, out_dir: str) -> Iterator[Tuple[str, str, str]]:
+    for root, dirs, files in os.walk(c_dir):
+        dirs.sort()
+        relative_dir = os.path.relpath(root, c_dir)
+        for name in sorted(files):
+            if name.endswith(".c"):
+                py_name = name[:-1] + "py"
+                yield (
+                    os.path.normpath(os.path.join(py_dir, relative_dir, py_name)),
+                    os.path.join(root, name),
+                    os.path.normpath(os.path.join(out_dir, relative_dir, name)),
+                )
+
+
+def merge_directory(
+    c_dir: str, py_dir: str, out_dir: str, jobs: Optional[int] = None
+) -> List[str]:
+    """returns error messages of the tests that could not be converted"""
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        jobs_to_run = find_jobs(c_dir, py_dir, out_dir)
+        results = executor.map(merge_job, jobs_to_run, chunksize=8)
+        return [error for error in results if error is not None]
+
+
+def directory_main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python part1_to_part3.py --dir",
+        description="merge reference gamma_golden_possible results into C tests",
+    )
+    parser.add_argument("c_tests")
+    parser.add_argument("py_tests")
+    parser.add_argument("output")
+    parser.add_argument("--jobs", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.c_tests):
+        exit(f"{args.c_tests} nie jest katalogiem")
+
+    errors = merge_directory(args.c_tests, args.py_tests, args.output, args.jobs)
+    for error in errors:
+        print(error, file=sys.stderr)
+    sys.exit(int(bool(errors)))
 
 
 def main() -> None:
-    import part1
-    global correct_golden_possible
-    correct_golden_possible = part1.gamma_golden_possible
-    part1.gamma_golden_possible = gamma_golden_possible
+    if len(sys.argv) > 1 and sys.argv[1] == "--dir":
+        directory_main(sys.argv[2:])
+        return
 
     try:
         path_to_test = sys.argv[1]
@@ -36,24 +173,15 @@ def main() -> None:
         )
     else:
         with open(path_to_test) as f:
-            test = f.read().replace("assert ", "")
+            test = f.read()
         with open(path_to_test_c) as f:
             c_test = f.read()
-        if not re.findall(r"gamma_golden_possible", c_test):
-            print(c_test)
-            return
-        global STATEMENTS
-        STATEMENTS.clear()
-        exec(test)
-        i = 0
-        with open(path_to_test_c) as f:
-            for line in f.readlines():
-                if re.findall(r"gamma_golden_possible", line):
-                    name = re.findall(r"(?<=gamma_golden_possible\()\w+", line)[0]
-                    print(STATEMENTS[i].format(name))
-                    i += 1
-                else:
-                    print(line)
+        output_cache.run_cached(
+            "part1_to_part3",
+            [test.encode(), c_test.encode()],
+            CACHE_SOURCES,
+            lambda: merge(test, c_test),
+        )
 
 
 if __name__ == "__main__":
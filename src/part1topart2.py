@@ -1,11 +1,20 @@
-# type: ignore
-
 from __future__ import annotations
 
 import random
+import re
 import sys
 
-from typing import Any, List
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from part2 import WHITESPACES
 
@@ -15,46 +24,135 @@ dzialajaca z part2 batch mode;
 skrypt na wejsciu bierze sciezke do pliku {nazwa_testu}.py, a na stdout
 wypluwa ten test skonwertowany na LISTE POLECEN w formacie pliku .in
 batch mode.
+Test nie jest wykonywany - wywolania gamma_* sa rozpoznawane linia po linii
+(z pominieciem docstringow i napisow), wiec plik moze byc dowolnie duzy.
 Nastepnie ta zwrotka moze zostac przepuszczona przez part2.py 
 aby wyprodukowac pliki .out i .err
 
 Usage: python part1topart2.py sciezka/do/testu.py > test.in
 """
 
+# wywolanie funkcji gamma_* bez nawiasow w argumentach
+CALL = re.compile(r"\b(gamma_\w+)\s*\(([^()]*)\)")
+ASSIGNMENT = re.compile(r"(\w+)\s*=\s*$")
+STRING_LITERAL = re.compile(r""""(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*'""")
+DOCSTRING_QUOTES = ['"""', "'''"]
+
+Argument = Union[int, str]
+
+
+def gamma_new(width: int, height: int, players: int, areas: int) -> str:
+    return f"B {width} {height} {players} {areas}"
+
+
+def gamma_delete(*args: Any) -> str:
+    return ""
+
+
+def gamma_move(g: Any, player: int, x: int, y: int, *args: Any) -> str:
+    return f"m {player} {x} {y}"
+
 
-STATEMENTS: List[str] = []
+def gamma_golden_move(g: Any, player: int, x: int, y: int, *args: Any) -> str:
+    return f"g {player} {x} {y}"
 
 
-def gamma_new(width: int, height: int, players: int, areas: int) -> None:
-    STATEMENTS.append(f"B {width} {height} {players} {areas}")
+def gamma_busy_fields(g: Any, player: int) -> str:
+    return f"b {player}"
 
 
-def gamma_delete(*args: Any) -> None:
-    STATEMENTS.append("")
+def gamma_free_fields(g: Any, player: Any) -> str:
+    return f"f {player}"
 
 
-def gamma_move(g: Any, player: int, x: int, y: int, *args: Any) -> None:
-    STATEMENTS.append(f"m {player} {x} {y}")
+def gamma_golden_possible(g: Any, player: Any) -> str:
+    return f"q {player}"
 
 
-def gamma_golden_move(g: Any, player: int, x: int, y: int, *args: Any) -> None:
-    STATEMENTS.append(f"g {player} {x} {y}")
+def gamma_board(g: Any) -> str:
+    return "p"
 
 
-def gamma_busy_fields(g: Any, player: int) -> None:
-    STATEMENTS.append(f"b {player}")
+TRANSLATORS: Dict[str, Callable[..., str]] = {
+    f.__name__: f
+    for f in [
+        gamma_new,
+        gamma_delete,
+        gamma_move,
+        gamma_golden_move,
+        gamma_busy_fields,
+        gamma_free_fields,
+        gamma_golden_possible,
+        gamma_board,
+    ]
+}
 
 
-def gamma_free_fields(g: Any, player: Any) -> None:
-    STATEMENTS.append(f"f {player}")
+def code_fragments(lines: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """(line number, code of the line) without docstrings,
+    string literals and comments"""
+    docstring: Optional[str] = None  # cudzyslow zamykajacy otwarty docstring
+    for number, line in enumerate(lines, start=1):
+        code = ""
+        while line:
+            if docstring is not None:
+                end = line.find(docstring)
+                if end == -1:
+                    break
+                line, docstring = line[end + 3 :], None
+                continue
 
+            starts = [(line.find(q), q) for q in DOCSTRING_QUOTES if q in line]
+            if not starts:
+                code += line
+                break
+            start, docstring = min(starts)
+            code += line[:start]
+            line = line[start + 3 :]
 
-def gamma_golden_possible(g: Any, player: Any) -> None:
-    STATEMENTS.append(f"q {player}")
+        code = STRING_LITERAL.sub('""', code).split("#")[0]
+        if code.strip():
+            yield number, code
 
 
-def gamma_board(g: Any) -> None:
-    STATEMENTS.append("p")
+def parse_argument(argument: str) -> Argument:
+    """int literal or a name (of the board)"""
+    argument = argument.strip()
+    if argument.isidentifier():
+        return argument
+    return int(argument, 0)
+
+
+def recognise_calls(
+    lines: Iterable[str],
+) -> Iterator[Tuple[int, Optional[str], str, List[Argument]]]:
+    """(line number, assigned name, function name, arguments) of gamma_* calls
+    in the test; the assigned name is set for calls like `board = gamma_new(...)`"""
+    for number, code in code_fragments(lines):
+        for match in CALL.finditer(code):
+            name, raw_arguments = match.groups()
+            try:
+                arguments = (
+                    [parse_argument(a) for a in raw_arguments.split(",")]
+                    if raw_arguments.strip()
+                    else []
+                )
+            except ValueError:
+                raise ValueError(f"line {number}: unsupported arguments in {match[0]}")
+            assignment = ASSIGNMENT.search(code, 0, match.start())
+            yield number, assignment[1] if assignment else None, name, arguments
+
+
+def translate(lines: Iterable[str]) -> Iterator[str]:
+    """batch mode commands of a part1 style test"""
+    for number, _, name, arguments in recognise_calls(lines):
+        translator = TRANSLATORS.get(name)
+        if translator is None:
+            raise ValueError(f"line {number}: unknown function {name}")
+        try:
+            yield translator(*arguments)
+        except TypeError:
+            raise ValueError(f"line {number}: wrong number of arguments to {name}")
 
 
 def make_random_spacing() -> str:
@@ -123,17 +221,6 @@ def main() -> None:
         "obfuscate" in p.lower() for p in sys.argv[1:]
     )
 
-    import part1
-
-    part1.gamma_new = gamma_new
-    part1.gamma_delete = gamma_delete
-    part1.gamma_move = gamma_move
-    part1.gamma_golden_move = gamma_golden_move
-    part1.gamma_busy_fields = gamma_busy_fields
-    part1.gamma_free_fields = gamma_free_fields
-    part1.gamma_golden_possible = gamma_golden_possible
-    part1.gamma_board = gamma_board
-
     try:
         path_to_test = sys.argv[1]
     except IndexError:
@@ -142,17 +229,19 @@ def main() -> None:
             "usage python skrypt.py sciezka/do/testu.py > test.in"
         )
     else:
+        written = False
         with open(path_to_test) as f:
-            test = f.read().replace("assert ", "")
-
-        global STATEMENTS
-        STATEMENTS.clear()
-        exec(test)
-
-        if obfuscate:
-            STATEMENTS = [obfuscate_line(s) for s in STATEMENTS]
-
-        print(*STATEMENTS, sep="\n")
+            try:
+                for statement in translate(f):
+                    if obfuscate:
+                        statement = obfuscate_line(statement)
+                    sys.stdout.write(statement + "\n")
+                    written = True
+            except ValueError as e:
+                exit(f"{path_to_test}: {e}")
+
+        if not written:  # jak print() bez argumentow
+            sys.stdout.write("\n")
 
 
 if __name__ == "__main__":
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import bisect
 import sys
 
 from typing import Any, Dict, List, Optional, cast
 
+import output_cache
 import part1
 
 """
@@ -41,47 +43,53 @@ class PlayerPointer:
 
     def can_move(self, player: int) -> bool:
         assert self.game is not None
-        return part1.gamma_free_fields(
-            self.game, player
-        ) != 0 or part1.gamma_golden_possible(self.game, player)
+        return self.game.can_move(player)
+
+    def _player_after(self, offset: int) -> int:
+        assert self.game is not None
+        return (self.current + offset - 1) % self.game.players + 1
 
     def advance(self) -> bool:
         """Przesuwa numer na nastepnego gracza"""
         assert self.game is not None
-        players = self.game.players
-        next_player = (self.current % players) + 1
-        next_player_guard = next_player
-
-        if self.can_move(next_player):
-            self.current = next_player
-            return True
-
-        while True:
-            next_player = (next_player % players) + 1
+        # aktualny gracz sprawdzany jest na koncu
+        for offset in range(1, self.game.players + 1):
+            next_player = self._player_after(offset)
             if self.can_move(next_player):
                 self.current = next_player
                 return True
 
-            if next_player == next_player_guard:
-                break
-
         return False
 
-    def count_skips_to_player(self, player: int) -> Optional[int]:
-        """Zwraca ile razy trzeba zrobic SKIPTURN zeby dojsc do tego gracza"""
+    def skip(self, turns: int) -> bool:
+        """Jak `turns` razy advance: gracze, ktorzy moga sie ruszyc, sa
+        wyznaczani raz, a reszta to arytmetyka modulo ich liczba"""
         assert self.game is not None
-        simulation = PlayerPointer(self.current, self.game)
-        max_skips = self.game.players + 2  # nie wiem czy +0 czy +1 wiec +2...
-        skips = 0
-
-        while simulation.current != player:
-            simulation.advance()
-            skips += 1
+        if turns <= 0:
+            return True
+        movable = self.game.movable_players()
+        if not movable:
+            return False
 
-            if skips > max_skips:
-                return None
+        # pierwszy advance zatrzymuje sie na pierwszym takim graczu po aktualnym
+        first = bisect.bisect_right(movable, self.current)
+        self.current = movable[(first + turns - 1) % len(movable)]
+        return True
 
-        return skips
+    def count_skips_to_player(self, player: int) -> Optional[int]:
+        """Zwraca ile razy trzeba zrobic SKIPTURN zeby dojsc do tego gracza"""
+        assert self.game is not None
+        if self.current == player:
+            return 0
+        if not 1 <= player <= self.game.players or not self.can_move(player):
+            return None  # advance nigdy nie zatrzyma sie na tym graczu
+
+        # kazdy SKIPTURN zatrzymuje sie na kolejnym graczu, ktory moze sie ruszyc
+        distance = (player - self.current) % self.game.players
+        return sum(
+            self.can_move(self._player_after(offset))
+            for offset in range(1, distance + 1)
+        )
 
 
 CURRENT_PLAYER = PlayerPointer()
@@ -89,12 +97,12 @@ STATEMENTS: List[str] = []
 DEFAULT_WAIT_TIME = 0.25
 
 
-def skip_turns(to_skip: int) -> None:
+def skip_turns(to_skip: int, player: int) -> None:
+    """to_skip to wynik count_skips_to_player(player)"""
     if to_skip:
         STATEMENTS.append("SETWAIT 0")
         STATEMENTS.append(f"SKIPTURNS {to_skip}")
-        for _ in range(to_skip):
-            CURRENT_PLAYER.advance()
+        CURRENT_PLAYER.current = player
         STATEMENTS.append(f"SETWAIT {DEFAULT_WAIT_TIME}")
 
 
@@ -121,7 +129,7 @@ def gamma_move(g: part1.Gamma, player: int, x: int, y: int, *args: Any) -> bool:
 
     skips_needed = CURRENT_PLAYER.count_skips_to_player(player)
     if skips_needed is not None:
-        skip_turns(skips_needed)
+        skip_turns(skips_needed, player)
 
     STATEMENTS.append(f"MOVE")
     if ret:
@@ -141,7 +149,7 @@ def gamma_golden_move(g: part1.Gamma, player: int, x: int, y: int) -> bool:
 
     skips_needed = CURRENT_PLAYER.count_skips_to_player(player)
     if skips_needed is not None:
-        skip_turns(skips_needed)
+        skip_turns(skips_needed, player)
 
     # todo jak z tym skipowaniem? golden_possible jest uszkodzone
     # wiec python zrobi ruch a interctive pominie
@@ -157,6 +165,24 @@ def gamma_golden_move(g: part1.Gamma, player: int, x: int, y: int) -> bool:
     return ret
 
 
+def translate(test: str, only_final_board: bool) -> None:
+    STATEMENTS.clear()
+    CURRENT_PLAYER.reset()
+
+    context: Dict[str, Any] = {}
+    exec(test.replace("assert ", ""), context, context)  # to zdefiniuje board
+    # bez tego przypisania edytor i mypy
+    # nie widzi nazwy board - bo jest tworzona dynamicznie w ctx
+    board = cast(part1.Gamma, context["board"])
+    assert board is not None
+
+    if only_final_board:
+        # output expected final board
+        print(part1.gamma_board(board), end="")
+    else:  # normal -- compile
+        print(*STATEMENTS, sep="\n")
+
+
 def main() -> None:
     part1.gamma_new = gamma_new
     part1.gamma_move = gamma_move
@@ -174,23 +200,15 @@ def main() -> None:
         )
     else:
         with open(path_to_test) as f:
-            test = f.read().replace("assert ", "")
-
-        STATEMENTS.clear()
-        CURRENT_PLAYER.reset()
-
-        context: Dict[str, Any] = {}
-        exec(test, context, context)  # to zdefiniuje board w context
-        # bez tego przypisania edytor i mypy
-        # nie widzi nazwy board - bo jest tworzona dynamicznie w ctx
-        board = cast(part1.Gamma, context["board"])
-        assert board is not None
-
-        if len(sys.argv) > 2 and "--test" in sys.argv:
-            # output expected final board
-            print(part1.gamma_board(board), end="")
-        else:  # normal -- compile
-            print(*STATEMENTS, sep="\n")
+            test = f.read()
+
+        only_final_board = len(sys.argv) > 2 and "--test" in sys.argv
+        output_cache.run_cached(
+            "part1tovm",
+            [test.encode(), str(only_final_board).encode()],
+            ["part1tovm.py"],
+            lambda: translate(test, only_final_board),
+        )
 
 
 if __name__ == "__main__":
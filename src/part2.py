@@ -1,7 +1,8 @@
 import sys
 
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
+import output_cache
 import part1
 
 WHITESPACES = "\t \v\f\r"
@@ -95,20 +96,49 @@ def run_command(statement: str, line: int) -> bool:
     return False
 
 
-def main() -> None:
-    statements = sys.stdin.read()
+def run_statements(statements: str) -> None:
+    """runs a whole batch mode input, starting with no board"""
+    global board
+    board = None
     split_statements = statements.split("\n")
 
     for line, statement in enumerate(split_statements, start=1):
-        if line == len(split_statements):
-            if statement != "":
-                print(f"ERROR {line}", file=sys.stderr)
-        elif statement == "" or statement[0] == "#":
-            pass
-        else:
-            end_game = run_command(statement, line)
-            if end_game:
-                return
+        end_game = run_line(statement, line, line == len(split_statements))
+        if end_game:
+            return
+
+
+def run_line(statement: str, line: int, last: bool = False) -> bool:
+    """last oznacza fragment po ostatnim znaku nowej linii"""
+    if last:
+        if statement != "":
+            print(f"ERROR {line}", file=sys.stderr)
+    elif statement == "" or statement[0] == "#":
+        pass
+    else:
+        return run_command(statement, line)
+
+    return False
+
+
+def expected_output(statements: str) -> Tuple[str, str]:
+    """zwraca (stdout, stderr) wzorcowego rozwiazania dla podanego wejscia"""
+    return output_cache.cached_output(
+        "part2",
+        [statements.encode()],
+        ["part2.py"],
+        lambda: run_statements(statements),
+    )
+
+
+def main() -> None:
+    statements = sys.stdin.read()
+    output_cache.run_cached(
+        "part2",
+        [statements.encode()],
+        ["part2.py"],
+        lambda: run_statements(statements),
+    )
 
 
 if __name__ == "__main__":
@@ -4,7 +4,16 @@ import sys
 import time
 
 from dataclasses import dataclass
-from typing import Iterable, List, Sequence, Tuple
+from typing import (
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 __doc__ = """
 Ten plik zawiera kompilator jezyka wysokiego poziomu
@@ -76,6 +85,10 @@ IMPLIED
 """
 
 
+# najwiekszy blok bajtow skladany przed zapisem, ogranicza zuzycie pamieci
+WRITE_SIZE = 1 << 16
+
+
 class Direction(enum.Enum):
     UP = "UP"
     DOWN = "DOWN"
@@ -87,6 +100,8 @@ class InstructionType(enum.Enum):
     WAIT = enum.auto()
     VERBATIM = enum.auto()
     NOOP = enum.auto()
+    # zebrane bajty trzeba wyslac od razu - czytanie wejscia by blokowalo
+    FLUSH = enum.auto()
 
 
 @dataclass()
@@ -185,22 +200,24 @@ class Compiler:
         if column >= self.width or row >= self.height:
             raise ValueError(f"GOTO outside board: {column} {row}")
 
-        instructions: List[CompiledInstruction] = []
+        codes: List[int] = []
 
         while self.x < column:
-            instructions.append(self._compile_arrow_move(Direction.RIGHT))
+            codes.extend(self._arrow_move(Direction.RIGHT))
         while self.x > column:
-            instructions.append(self._compile_arrow_move(Direction.LEFT))
+            codes.extend(self._arrow_move(Direction.LEFT))
         while self.y < row:
-            instructions.append(self._compile_arrow_move(Direction.UP))
+            codes.extend(self._arrow_move(Direction.UP))
         while self.y > row:
-            instructions.append(self._compile_arrow_move(Direction.DOWN))
+            codes.extend(self._arrow_move(Direction.DOWN))
 
-        if not instructions:  # already there
+        if not codes:  # already there
             return [CompiledInstruction(op=InstructionType.NOOP)]
-        return instructions
+        # wszystkie strzalki jako jedna instrukcja
+        return [CompiledInstruction(op=InstructionType.VERBATIM, text=bytes(codes))]
 
-    def _compile_arrow_move(self, direction: Direction) -> CompiledInstruction:
+    def _arrow_move(self, direction: Direction) -> bytes:
+        """przesuwa kursor i zwraca kod strzalki"""
         code = {
             Direction.UP: 65,
             Direction.DOWN: 66,
@@ -217,8 +234,11 @@ class Compiler:
         if self.debug:
             print(self.x, self.y)
 
+        return bytes([27, 91, code[direction]])
+
+    def _compile_arrow_move(self, direction: Direction) -> CompiledInstruction:
         return CompiledInstruction(
-            op=InstructionType.VERBATIM, text=bytes([27, 91, code[direction]])
+            op=InstructionType.VERBATIM, text=self._arrow_move(direction)
         )
 
     def _compile_user_move(self, statement: str) -> CompiledInstruction:
@@ -272,22 +292,75 @@ class Compiler:
 
         return compiled
 
-    def compile(self, raw_input: str) -> Iterable[CompiledInstruction]:
+    def reset(self) -> None:
         self.wait_time = self.default_wait_time
         self.initialized = False
 
-        stripped_lines = (line.strip() for line in raw_input.splitlines())
-        statements = (
-            map(str.strip, line.split())
-            for line in stripped_lines
-            if line and line[0] != "#"
+    def compile_statement(self, tokens: Sequence[str]) -> List[CompiledInstruction]:
+        """Jedna instrukcja (linia podzielona na slowa) w aktualnym stanie
+        kompilatora - np. do sledzenia kursora albo liczenia kosztu skryptu"""
+        return self._compile_statement(*tokens)
+
+    def compile(self, raw_input: str) -> Iterator[CompiledInstruction]:
+        return self.compile_lines(raw_input.splitlines())
+
+    def compile_lines(
+        self,
+        lines: Iterable[str],
+        would_block: Optional[Callable[[], bool]] = None,
+    ) -> Iterator[CompiledInstruction]:
+        """Kompiluje leniwie - linie sa czytane dopiero, kiedy potrzebne sa
+        kolejne instrukcje, wiec np. sys.stdin moze byc wykonywane od razu.
+        Jezeli would_block() mowi, ze czytanie kolejnej linii by blokowalo,
+        przed nim wstawiana jest instrukcja FLUSH"""
+        self.reset()
+        return coalesce(
+            filter(
+                lambda c: c.op != InstructionType.NOOP,
+                self._compile_lines(lines, would_block),
+            ),
+            WRITE_SIZE,
         )
 
-        compiled_statements = itertools.chain.from_iterable(
-            itertools.takewhile(bool, (self._compile_statement(*s) for s in statements))
-        )
+    def _compile_lines(
+        self, lines: Iterable[str], would_block: Optional[Callable[[], bool]]
+    ) -> Iterator[CompiledInstruction]:
+        remaining = iter(lines)
+        while True:
+            if would_block is not None and would_block():
+                yield CompiledInstruction(op=InstructionType.FLUSH)
+            line = next(remaining, None)
+            if line is None:
+                return
+            line = line.strip()
+            if not line or line[0] == "#":
+                continue
+            compiled = self._compile_statement(*line.split())
+            if not compiled:
+                return
+            yield from compiled
+
+
+def coalesce(
+    instructions: Iterable[CompiledInstruction], max_size: Optional[int] = None
+) -> Iterator[CompiledInstruction]:
+    """Laczy kolejne instrukcje VERBATIM (bez WAIT pomiedzy nimi) w jedna;
+    z max_size blok jest oddawany, gdy osiagnie ten rozmiar"""
+    text = bytearray()
+    for instruction in instructions:
+        if instruction.op == InstructionType.VERBATIM:
+            text += instruction.text
+            if max_size is not None and len(text) >= max_size:
+                yield CompiledInstruction(op=InstructionType.VERBATIM, text=bytes(text))
+                text = bytearray()
+            continue
+        if text:
+            yield CompiledInstruction(op=InstructionType.VERBATIM, text=bytes(text))
+            text = bytearray()
+        yield instruction
 
-        return filter(lambda c: c.op != InstructionType.NOOP, compiled_statements)
+    if text:
+        yield CompiledInstruction(op=InstructionType.VERBATIM, text=bytes(text))
 
 
 DefaultCompiler = Compiler
@@ -308,26 +381,71 @@ class Interpreter:
                 time.sleep(instruction.wait_time)
 
     def run(self, instructions: Iterable[CompiledInstruction]) -> None:
+        end_of_transmission = CompiledInstruction(
+            op=InstructionType.VERBATIM, text=bytes([4])
+        )
+
+        if self.no_wait:
+            # bez czekania strumien idzie zapisami po WRITE_SIZE bajtow,
+            # mniejszymi tylko gdy wejscie jeszcze nie nadeszlo (FLUSH)
+            verbatim = (
+                i
+                for i in itertools.chain(instructions, [end_of_transmission])
+                if i.op != InstructionType.WAIT
+            )
+            for instruction in coalesce(verbatim, WRITE_SIZE):
+                self._run_instruction(instruction)
+            return
+
         for instruction in instructions:
             self._run_instruction(instruction)
+        self._run_instruction(end_of_transmission)
 
-        end_of_transmission = 4
-        self._run_instruction(
-            CompiledInstruction(
-                op=InstructionType.VERBATIM, text=bytes([end_of_transmission])
-            )
-        )
+
+class LineReader:
+    """Linie strumienia czytane blokami (read1) - wiadomo, czy kolejna
+    linia jest juz w buforze, czy jej czytanie moze blokowac"""
+
+    def __init__(self, stream: BinaryIO, chunk_size: int = WRITE_SIZE) -> None:
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self._buffer = b""
+        self._start = 0
+
+    def __iter__(self) -> "LineReader":
+        return self
+
+    def __next__(self) -> str:
+        while True:
+            end = self._buffer.find(b"\n", self._start) + 1
+            if end:
+                line, self._start = self._buffer[self._start : end], end
+                return line.decode()
+
+            chunk = self.stream.read1(self.chunk_size)  # type: ignore
+            if not chunk:
+                line, self._buffer = self._buffer[self._start :], b""
+                if not line:
+                    raise StopIteration
+                return line.decode()
+            self._buffer = self._buffer[self._start :] + chunk
+            self._start = 0
+
+    def would_block(self) -> bool:
+        return self._buffer.find(b"\n", self._start) == -1
 
 
 def main(debug: bool, no_wait: bool, compile_only: bool) -> None:
-    raw_input = sys.stdin.read()
     if compile_only:
-        print(*Compiler(debug=debug).compile(raw_input), sep="\n", flush=True)
+        for instruction in Compiler(debug=debug).compile_lines(sys.stdin):
+            print(instruction)
+        sys.stdout.flush()
         exit(0)
 
     try:
+        lines = LineReader(sys.stdin.buffer)
         Interpreter(no_wait=no_wait).run(
-            DefaultCompiler(debug=debug).compile(raw_input)
+            DefaultCompiler(debug=debug).compile_lines(lines, lines.would_block)
         )
     except BrokenPipeError as e:
         print(f"Broken pipe {e}", file=sys.stderr)
@@ -18,26 +18,6 @@ if ! [[ -f "$plik_testowany" ]]; then
   exit 1
 fi
 
-native_gamma_input=$(mktemp)
-gamma_output=$(mktemp)
-trap 'rm -f "native_gamma_input"' INT TERM HUP EXIT
-trap 'rm -f "gamma_output"' INT TERM HUP EXIT
-
-plik_z_prawidlowym_wynikiem=${plik_testowany//.ivml/.vmr}
-
-python3 -u part2_ivm.py --nowait < "$plik_testowany" 1> "$native_gamma_input"
-"$gamma_executable" < "$native_gamma_input" > "$gamma_output"
-err=$?
-
-if [[ $err != 0 ]]; then
-  exit 1
-else
-  python3 verify_interactive_final_board.py "$gamma_output" "$plik_z_prawidlowym_wynikiem"
-  err=$?
-
-  if [[ $err != 0 ]]; then
-    exit 1
-  else
-    exit 0
-  fi
-fi
\ No newline at end of file
+# jak wczesniej: kod wyjscia 0 albo 1, raport tylko dla blednego testu
+exec python3 interactive_runner.py --nowait --failures-only \
+  "$gamma_executable" "$plik_testowany"
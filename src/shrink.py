@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import argparse
+import copy
+import io
+import sys
+
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Dict, List, Optional, Tuple
+
+import diff_test
+import part1
+import part2
+
+"""
+Minimalizacja wejscia batch mode, na ktorym binarka gamma rozni sie
+od wzorcowego part2 (delta debugging): usuwa coraz mniejsze kawalki linii
+dopoki binarka wciaz zwraca ten sam rodzaj bledu (mismatch/timeout/crash).
+
+Oczekiwany wynik kandydata liczony jest w tym samym procesie; wspolny
+poczatek kandydata i aktualnego wejscia nie jest wykonywany od nowa,
+tylko wznawiany z zapamietanego stanu gry (snapshotu) z granicy prefiksu.
+
+Usage: python shrink.py sciezka/do/gamma failing.in [-o minimal.in]
+       [--timeout SEKUNDY]
+"""
+
+Snapshot = Tuple[Optional[part1.Gamma], str, str]
+
+# ile snapshotow trzymac mniej wiecej na cale wejscie
+SNAPSHOTS_PER_INPUT = 64
+
+
+class OracleReplayer:
+    """wykonuje part2 na kandydatach postaci lines[:cut] + cos_innego,
+    gdzie lines to aktualne (najmniejsze znane) wejscie"""
+
+    lines: List[str]
+    snapshots: Dict[int, Snapshot]
+
+    def __init__(self, lines: List[str]) -> None:
+        self.lines = lines
+        self.stride = max(1, len(lines) // SNAPSHOTS_PER_INPUT)
+        self.snapshots = {0: (None, "", "")}
+        self.replayed_lines = 0
+
+    def accept(self, candidate: List[str], cut: int) -> None:
+        """kandydat zostaje nowym wejsciem; snapshoty do cut sa wciaz wazne"""
+        self.lines = candidate
+        self.snapshots = {k: v for k, v in self.snapshots.items() if k <= cut}
+
+    def run(self, candidate: List[str], cut: int) -> Tuple[str, str]:
+        resume_from = max(k for k in self.snapshots if k <= cut)
+        board, out_prefix, err_prefix = self.snapshots[resume_from]
+
+        out, err = io.StringIO(), io.StringIO()
+        out.write(out_prefix)
+        err.write(err_prefix)
+        part2.board = copy.deepcopy(board)
+
+        with redirect_stdout(out), redirect_stderr(err):
+            for index in range(resume_from, len(candidate)):
+                if index < cut and index % self.stride == 0:
+                    if index not in self.snapshots:
+                        self.snapshots[index] = (
+                            copy.deepcopy(part2.board),
+                            out.getvalue(),
+                            err.getvalue(),
+                        )
+                self.replayed_lines += 1
+                last = index == len(candidate) - 1
+                if part2.run_line(candidate[index], index + 1, last):
+                    break
+
+        return out.getvalue(), err.getvalue()
+
+
+class Shrinker:
+    def __init__(self, binary: str, statements: str, timeout: float) -> None:
+        self.binary = binary
+        self.timeout = timeout
+        self.replayer = OracleReplayer(statements.split("\n"))
+        self.tests_run = 0
+        self.target = self._judge(self.replayer.lines, len(self.replayer.lines))
+
+    @property
+    def lines(self) -> List[str]:
+        return self.replayer.lines
+
+    def _judge(self, candidate: List[str], cut: int) -> str:
+        self.tests_run += 1
+        report = diff_test.judge(
+            self.binary,
+            "\n".join(candidate),
+            self.timeout,
+            lambda: self.replayer.run(candidate, cut),
+        )
+        return str(report["status"])
+
+    def _try_remove(self, start: int, end: int) -> bool:
+        candidate = self.lines[:start] + self.lines[end:]
+        if self._judge(candidate, start) != self.target:
+            return False
+        self.replayer.accept(candidate, start)
+        return True
+
+    def _pass(self, chunk: int) -> bool:
+        """usuwa kawalki od konca, zeby jak najdluzszy prefiks
+        zostawal wspolny i mogl byc wznawiany ze snapshotow"""
+        removed = False
+        end = len(self.lines) - 1  # ostatni element to fragment po ostatnim \n
+        while end > 0:
+            start = max(0, end - chunk)
+            if self._try_remove(start, end):
+                removed = True
+            end = start
+        return removed
+
+    def shrink(self) -> List[str]:
+        if self.target == "ok":
+            raise ValueError("binarka przechodzi ten test, nie ma czego minimalizowac")
+
+        chunk = max(1, (len(self.lines) - 1) // 2)
+        while chunk > 1:
+            self._pass(chunk)
+            print(f"chunk {chunk}: {len(self.lines) - 1} lines", file=sys.stderr)
+            chunk = min(chunk // 2, (len(self.lines) - 1) // 2) or 1
+
+        while self._pass(1):
+            print(f"chunk 1: {len(self.lines) - 1} lines", file=sys.stderr)
+
+        return self.lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="minimise a failing .in file")
+    parser.add_argument("binary")
+    parser.add_argument("input")
+    parser.add_argument("-o", "--output", help="write the result here, not stdout")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with open(args.input, newline="") as f:
+        statements = f.read()
+
+    shrinker = Shrinker(args.binary, statements, args.timeout)
+    try:
+        lines = shrinker.shrink()
+    except ValueError as e:
+        exit(str(e))
+
+    print(
+        f"{shrinker.target}: {len(statements.split(chr(10))) - 1} -> "
+        f"{len(lines) - 1} lines, {shrinker.tests_run} runs, "
+        f"{shrinker.replayer.replayed_lines} lines replayed",
+        file=sys.stderr,
+    )
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            f.write("\n".join(lines))
+    else:
+        sys.stdout.write("\n".join(lines))
+
+
+if __name__ == "__main__":
+    main()
@@ -23,9 +23,12 @@ from test_tools import (
     flatten,
     get_all_board_coords,
     get_coords_around,
+    get_spiral_coords,
     make_assert,
     make_board,
     make_comment,
+    query,
+    query_all_players,
     unsafe_gamma_move,
 )
 
@@ -141,6 +144,9 @@ def test_strip(store: StatementStoreType, **kwargs: Any) -> None:
     board = make_board(store, width, height, players, areas)
 
     def run_checks_for_all_players() -> None:
+        query_all_players(
+            board, gamma_busy_fields, gamma_free_fields, gamma_golden_possible
+        )
         for p in range(1, players + 1):
             store(assert_call(gamma_golden_possible, board, p))
             store(assert_call(gamma_busy_fields, board, p))
@@ -187,11 +193,16 @@ def test_golden_move(store: StatementStoreType, **kwargs: Any) -> None:
     players = list(range(1, players_n + 1))
 
     def can_move(p: int) -> bool:
-        return bool(gamma_free_fields(board, p) or gamma_golden_possible(board, p))
+        return bool(
+            query(gamma_free_fields, board, p) or query(gamma_golden_possible, board, p)
+        )
 
     # this while can enter an infinite loop (golden_possible != golden_move)
     # so this needs to be guarded against -- thus max cycles limit
     for _ in range(25):  # max cycles
+        query_all_players(
+            board, gamma_busy_fields, gamma_free_fields, gamma_golden_possible
+        )
         if not any(can_move(p) for p in players):
             break
 
@@ -202,7 +213,7 @@ def test_golden_move(store: StatementStoreType, **kwargs: Any) -> None:
             store(assert_call(gamma_busy_fields, board, p))
             store(assert_call(gamma_golden_possible, board, p))
 
-            if gamma_free_fields(board, p):
+            if query(gamma_free_fields, board, p):
                 free_fields = list(flatten(board.board.get_grouped_areas()[FREE_FIELD]))
                 field = random.choice(free_fields)
                 store(assert_call(gamma_move, board, p, *field))
@@ -326,9 +337,12 @@ def test_golden_move_complexity(store: StatementStoreType, **kwargs: Any) -> Non
     board.max_areas = 1
 
     def can_move(p: int) -> bool:
-        return bool(gamma_free_fields(board, p) or gamma_golden_possible(board, p))
+        return bool(
+            query(gamma_free_fields, board, p) or query(gamma_golden_possible, board, p)
+        )
 
     for _ in range(25):
+        query_all_players(board, gamma_free_fields, gamma_golden_possible)
         if not any(can_move(p) for p in range(1, players + 1)):
             break
         for p in range(1, players + 1):
@@ -341,7 +355,10 @@ def test_golden_move_complexity(store: StatementStoreType, **kwargs: Any) -> Non
 
     board.max_areas = areas
     for i in range(round(tests)):
-        if not any(gamma_golden_possible(board, p) for p in range(1, players + 1)):
+        query_all_players(board, gamma_golden_possible)
+        if not any(
+            query(gamma_golden_possible, board, p) for p in range(1, players + 1)
+        ):
             break
 
         for p in range(1, players + 1):
@@ -380,7 +397,7 @@ def test_golden_move_complexity_single_square(
         store(assert_call(unsafe_gamma_move, board, 1, x, y))
 
     for i in range(tests):
-        if not gamma_golden_possible(board, 2):
+        if not query(gamma_golden_possible, board, 2):
             break
         x, y = random.randint(0, width - 1), random.randint(0, height - 1)
         store(assert_call(gamma_golden_move, board, 2, x, y))
@@ -444,6 +461,7 @@ def test_free_fields_complexity(store: StatementStoreType, **kwargs: Any) -> Non
         for _ in range(areas - 1):
             store(assert_call(unsafe_gamma_move, board, p, *all_fields.pop()))
 
+    query_all_players(board, gamma_free_fields)
     for p in range(1, players + 1):
         for _ in range(2):
             store(assert_call(gamma_free_fields, board, p))
@@ -451,6 +469,7 @@ def test_free_fields_complexity(store: StatementStoreType, **kwargs: Any) -> Non
     for p in range(1, players + 1):
         store(assert_call(unsafe_gamma_move, board, p, *all_fields.pop()))
 
+    query_all_players(board, gamma_free_fields)
     for _ in range(3):
         for p in range(1, players + 1):
             store(assert_call(gamma_free_fields, board, p))
@@ -474,6 +493,7 @@ def test_busy_fields_complexity(store: StatementStoreType, **kwargs: Any) -> Non
         for _ in range(areas):
             store(assert_call(unsafe_gamma_move, board, p, *all_fields.pop()))
 
+    query_all_players(board, gamma_busy_fields, gamma_free_fields)
     for _ in range(4):
         for p in range(1, players + 1):
             store(assert_call(gamma_free_fields, board, p))
@@ -519,6 +539,216 @@ def test_snake_gamma_possible_complexity(
     delete_board(store, board)
 
 
+def test_spiral_large(store: StatementStoreType, **kwargs: Any) -> None:
+    doc = (
+        "large board filled along a spiral, players take whole rings, "
+        "golden moves between neighboring rings"
+    )
+    store(make_comment(doc))
+
+    width, height = int(kwargs.get("width", 1000)), int(kwargs.get("height", 1000))
+    players = int(kwargs.get("players", 2))
+    checks = int(kwargs.get("checks", 100))
+    golden_moves = int(kwargs.get("golden_moves", 100))
+    rings = (min(width, height) + 1) // 2
+    areas = int(kwargs.get("areas", -(-rings // players)))
+
+    board = make_board(store, width, height, players, areas)
+    check_every = max(1, width * height // checks)
+
+    def ring_owner(x: int, y: int) -> int:
+        ring = min(x, y, width - 1 - x, height - 1 - y)
+        return ring % players + 1
+
+    for i, (x, y) in enumerate(get_spiral_coords(width, height)):
+        store(assert_call(gamma_move, board, ring_owner(x, y), x, y))
+        if i % check_every == 0:
+            query_all_players(board, gamma_busy_fields, gamma_free_fields)
+            for p in range(1, players + 1):
+                store(assert_call(gamma_busy_fields, board, p))
+                store(assert_call(gamma_free_fields, board, p))
+
+    query_all_players(board, gamma_golden_possible)
+    for p in range(1, players + 1):
+        store(assert_call(gamma_golden_possible, board, p))
+
+    for player in cycle_players(players=players, take=golden_moves):
+        x, y = random.randint(0, width - 1), random.randint(0, height - 1)
+        store(assert_call(gamma_golden_move, board, player, x, y))
+        store(assert_call(gamma_golden_possible, board, player))
+
+    delete_board(store, board)
+
+
+def test_checkerboard_large(store: StatementStoreType, **kwargs: Any) -> None:
+    doc = (
+        "large checkerboard, every field is a separate area, "
+        "golden moves merge up to four areas"
+    )
+    store(make_comment(doc))
+
+    width, height = int(kwargs.get("width", 1000)), int(kwargs.get("height", 1000))
+    golden_moves = int(kwargs.get("golden_moves", 100))
+    players, areas = 2, (width * height + 1) // 2
+
+    board = make_board(store, width, height, players, areas)
+
+    for y in range(height):
+        for x in range(width):
+            store(assert_call(gamma_move, board, (x + y) % 2 + 1, x, y))
+
+    query_all_players(
+        board, gamma_busy_fields, gamma_free_fields, gamma_golden_possible
+    )
+    for p in range(1, players + 1):
+        store(assert_call(gamma_busy_fields, board, p))
+        store(assert_call(gamma_free_fields, board, p))
+        store(assert_call(gamma_golden_possible, board, p))
+
+    for player in cycle_players(players=players, take=golden_moves):
+        x, y = random.randint(0, width - 1), random.randint(0, height - 1)
+        store(assert_call(gamma_golden_move, board, player, x, y))
+        store(assert_call(gamma_golden_possible, board, player % players + 1))
+
+    delete_board(store, board)
+
+
+def test_max_areas_large(store: StatementStoreType, **kwargs: Any) -> None:
+    doc = (
+        "large board where no two neighbors belong to the same player, "
+        "players have the maximal number of areas, moves into the holes"
+    )
+    store(make_comment(doc))
+
+    width, height = int(kwargs.get("width", 1000)), int(kwargs.get("height", 1000))
+    players = int(kwargs.get("players", 5))
+    holes = int(kwargs.get("holes", 1000))
+    assert players >= 3, "use test_checkerboard_large for 2 players"
+
+    # (x + 2y) mod players differs between any two neighbors for players >= 3
+    def owner(x: int, y: int) -> int:
+        return (x + 2 * y) % players + 1
+
+    all_fields = list(it.product(range(height), range(width)))
+    hole_fields = random.sample(all_fields, k=min(holes, len(all_fields)))
+    skipped = set(hole_fields)
+
+    fields_by_player = [0] * (players + 1)
+    for y, x in all_fields:
+        if (y, x) not in skipped:
+            fields_by_player[owner(x, y)] += 1
+    areas = max(fields_by_player)
+
+    board = make_board(store, width, height, players, areas)
+
+    for y, x in all_fields:
+        if (y, x) not in skipped:
+            store(assert_call(gamma_move, board, owner(x, y), x, y))
+
+    query_all_players(
+        board, gamma_busy_fields, gamma_free_fields, gamma_golden_possible
+    )
+    for p in range(1, players + 1):
+        store(assert_call(gamma_busy_fields, board, p))
+        store(assert_call(gamma_free_fields, board, p))
+        store(assert_call(gamma_golden_possible, board, p))
+
+    for (y, x), player in zip(hole_fields, cycle_players(players, take=len(skipped))):
+        store(assert_call(gamma_move, board, player, x, y))
+        store(assert_call(gamma_free_fields, board, player))
+
+    delete_board(store, board)
+
+
+def test_long_snake_large(store: StatementStoreType, **kwargs: Any) -> None:
+    doc = """gamma_golden_possible complexity on a snake filling a large board,
+    only the end of the snake can be taken without splitting it
+    sample board:
+    .....
+    22222
+    11111
+    ....1
+    11111"""
+    store(make_comment(doc))
+
+    width, height = int(kwargs.get("width", 1000)), int(kwargs.get("height", 1000))
+    queries = int(kwargs.get("golden_possible_queries", 1000))
+    golden_moves = int(kwargs.get("golden_moves", 100))
+    assert height >= 3, "height must be >= 3"
+    players, areas = 2, 1
+
+    board = make_board(store, width, height, players, areas)
+
+    for row in range(height - 2):
+        if row % 2 == 0:
+            indices = range(width) if row % 4 == 0 else reversed(range(width))
+            for x in indices:
+                store(assert_call(gamma_move, board, 1, x, row))
+        else:
+            pos_in_row = width - 1 if row % 4 == 1 else 0
+            store(assert_call(gamma_move, board, 1, pos_in_row, row))
+
+    for x in range(width):
+        store(assert_call(gamma_move, board, 2, x, height - 2))
+
+    query_all_players(board, gamma_free_fields, gamma_golden_possible)
+    for p in cycle_players(players, take=queries):
+        store(assert_call(gamma_golden_possible, board, p))
+        store(assert_call(gamma_free_fields, board, p))
+
+    snake_end = height - 3
+    for _ in range(golden_moves):
+        x = random.randint(0, width - 1)
+        y = snake_end if random.random() < 0.5 else random.randint(0, snake_end)
+        store(assert_call(gamma_golden_move, board, 2, x, y))
+        query_all_players(board, gamma_golden_possible)
+        store(assert_call(gamma_golden_possible, board, 1))
+        store(assert_call(gamma_golden_possible, board, 2))
+
+    delete_board(store, board)
+
+
+def test_dense_late_game_large(store: StatementStoreType, **kwargs: Any) -> None:
+    doc = "large board filled almost completely, then the late game"
+    store(make_comment(doc))
+
+    width, height = int(kwargs.get("width", 1000)), int(kwargs.get("height", 1000))
+    players = int(kwargs.get("players", 10))
+    areas = int(kwargs.get("areas", width * height // (4 * players) or 1))
+    density = float(kwargs.get("density", 0.98))
+    checks = int(kwargs.get("checks", 10))
+
+    board = make_board(store, width, height, players, areas)
+    all_fields = get_all_board_coords(board)
+    random.shuffle(all_fields)
+
+    filled = round(len(all_fields) * density)
+    for (y, x), player in zip(all_fields[:filled], cycle_players(players, filled)):
+        store(assert_call(gamma_move, board, player, x, y))
+
+    late_fields = all_fields[filled:]
+    check_every = max(1, len(late_fields) // checks)
+    for i, ((y, x), player) in enumerate(
+        zip(late_fields, cycle_players(players, take=len(late_fields)))
+    ):
+        if i % check_every == 0:
+            query_all_players(
+                board, gamma_busy_fields, gamma_free_fields, gamma_golden_possible
+            )
+            for p in range(1, players + 1):
+                store(assert_call(gamma_busy_fields, board, p))
+                store(assert_call(gamma_free_fields, board, p))
+                store(assert_call(gamma_golden_possible, board, p))
+
+        if query(gamma_free_fields, board, player) or random.random() < 0.5:
+            store(assert_call(gamma_move, board, player, x, y))
+        else:
+            field_y, field_x = random.choice(all_fields)
+            store(assert_call(gamma_golden_move, board, player, field_x, field_y))
+
+    delete_board(store, board)
+
+
 scenarios: Dict[str, ScenarioType] = {
     "fill_board_with_collisions": fill_board_with_collisions,
     "fill_board_without_collisions": fill_board_without_collisions,
@@ -537,6 +767,11 @@ scenarios: Dict[str, ScenarioType] = {
     "test_free_fields_complexity": test_free_fields_complexity,
     "test_busy_fields_complexity": test_busy_fields_complexity,
     "test_snake_gamma_possible_complexity": test_snake_gamma_possible_complexity,
+    "test_spiral_large": test_spiral_large,
+    "test_checkerboard_large": test_checkerboard_large,
+    "test_max_areas_large": test_max_areas_large,
+    "test_long_snake_large": test_long_snake_large,
+    "test_dense_late_game_large": test_dense_late_game_large,
 }
 
 __all__ = ["scenarios"]
@@ -1,19 +1,24 @@
 import itertools
 import random
+import weakref
 
 from typing import (
     Any,
     Callable,
     Dict,
     Iterable,
+    Iterator,
     List,
     Optional,
     Protocol,
+    Sequence,
     Set,
+    TextIO,
     Tuple,
     TypedDict,
     TypeVar,
     Union,
+    cast,
 )
 
 from gamma.gamma import Coords, Gamma
@@ -28,6 +33,14 @@ class PyCVariants(TypedDict):
     py: str
 
 
+# (function name, board name, arguments, expected result)
+CallRecord = Tuple[str, str, Tuple[int, ...], int]
+
+
+class RecordedPyCVariants(PyCVariants, total=False):
+    record: CallRecord
+
+
 ASSERT: Dict[str, PyCVariants] = {
     "equal": {"c": "assert( {} == {} );", "py": "assert {} == {} "},
     "notequal": {"c": "assert( {} != {} );", "py": "assert {} != {}"},
@@ -38,20 +51,84 @@ ASSERT: Dict[str, PyCVariants] = {
 
 EMPTY_LINE: PyCVariants = {"py": "\n", "c": "\n"}
 
+# functions which do not modify the board, their results can be memoised
+QUERY_FUNCTIONS = {
+    "gamma_busy_fields",
+    "gamma_free_fields",
+    "gamma_golden_possible",
+    "gamma_board",
+}
+
+# board -> ((epoch, max_areas), {(function name, args): result})
+# max_areas is a part of the key because scenarios change it directly
+QueryCacheEntry = Tuple[Tuple[int, int], Dict[Any, Any]]
+query_cache: "weakref.WeakKeyDictionary[Gamma, QueryCacheEntry]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+# query functions answered for all players at once by Gamma.stats(),
+# function name -> field of PlayerStats
+STATS_QUERIES = {
+    "gamma_busy_fields": "busy",
+    "gamma_free_fields": "free",
+    "gamma_golden_possible": "golden",
+}
+
+
+def _query_results(board: Gamma) -> Dict[Any, Any]:
+    state = (board.epoch, board.max_areas)
+    cached_state, results = query_cache.get(board, (None, {}))
+    if cached_state != state:
+        results = {}
+        query_cache[board] = (state, results)
+    return results
+
+
+def query(f: Callable[..., T], board: Gamma, *args: int) -> T:
+    """memoised f(board, *args) for functions from QUERY_FUNCTIONS,
+    results are dropped as soon as the board changes"""
+    results = _query_results(board)
+    key = (f.__name__, args)
+    if key not in results:
+        results[key] = f(board, *args)
+    return cast(T, results[key])
+
+
+def query_all_players(board: Gamma, *functions: Callable[..., Any]) -> None:
+    """memoises f(board, p) for every player and each of the functions
+    (from STATS_QUERIES) with a single Gamma.stats() call,
+    use before asking about all the players"""
+    results = _query_results(board)
+    names = [f.__name__ for f in functions]
+    stats = board.stats(golden="gamma_golden_possible" in names)
+    for name in names:
+        answers: Sequence[Any] = getattr(stats, STATS_QUERIES[name])
+        for player in range(1, board.players + 1):
+            results[(name, (player,))] = answers[player]
+
 
 def call(
     f: Callable[..., T], board: Optional[Gamma], *args: int, board_name: str = "board"
 ) -> Tuple[str, T]:
-    ret_val = f(*args) if board is None else f(board, *args)
+    if board is None:
+        ret_val = f(*args)
+    elif f.__name__ in QUERY_FUNCTIONS:
+        ret_val = query(f, board, *args)
+    else:
+        ret_val = f(board, *args)
     rendered_args = ", ".join(str(a) for a in args)
     board_arg = "" if not board else f"{board_name}{', ' if rendered_args else ''}"
-    f_name = f.__name__ if f.__name__ != "unsafe_gamma_move" else "gamma_move"
     return (
-        f"{f_name}({board_arg}{rendered_args})",
+        f"{c_function_name(f)}({board_arg}{rendered_args})",
         ret_val,
     )
 
 
+def c_function_name(f: Callable[..., Any]) -> str:
+    return f.__name__ if f.__name__ != "unsafe_gamma_move" else "gamma_move"
+
+
 def native_call(
     f: Callable[..., T], board: Optional[Gamma], *args: int, board_name: str = "board"
 ) -> PyCVariants:
@@ -68,7 +145,13 @@ def assert_call(
 ) -> PyCVariants:
     fn_call, ret_val = call(f, board, *args, board_name=board_name)
     ret_val = int(ret_val)  # bool -> int for compatibility with C
-    return make_assert(fn_call, str(ret_val), assert_type=assert_type)
+    statements = cast(
+        RecordedPyCVariants,
+        make_assert(fn_call, str(ret_val), assert_type=assert_type),
+    )
+    if board is not None and assert_type == "equal":
+        statements["record"] = (c_function_name(f), board_name, args, ret_val)
+    return statements
 
 
 def assign_call(
@@ -96,15 +179,90 @@ def make_assert(val1: str, val2: str = None, assert_type: str = "equal") -> PyCV
 
 
 def make_statements_dispatcher(
-    py_statements: List[str], c_statements: List[str]
+    py_output: TextIO, c_output: TextIO
 ) -> Callable[[PyCVariants], None]:
+    """statements are written straight to the output files,
+    separated by newlines (as if they were "\n".join-ed)"""
+    separator = ""
+
     def store(statements: PyCVariants) -> None:
-        py_statements.append(statements["py"])
-        c_statements.append(statements["c"])
+        nonlocal separator
+        py_output.write(separator + statements["py"])
+        c_output.write(separator + statements["c"])
+        separator = "\n"
 
     return store
 
 
+TABLE_OPS = {
+    "gamma_move": 0,
+    "gamma_golden_move": 1,
+    "gamma_busy_fields": 2,
+    "gamma_free_fields": 3,
+    "gamma_golden_possible": 4,
+}
+RECORD_ARGS = 3
+
+
+def render_record(record: CallRecord) -> str:
+    f_name, _, args, expected = record
+    padded_args = list(args) + [0] * (RECORD_ARGS - len(args))
+    fields = [TABLE_OPS[f_name], *padded_args, expected]
+    return ", ".join(str(field % 2 ** 32) for field in fields) + ","
+
+
+def make_table_statements_dispatcher(
+    py_output: TextIO, c_output: TextIO
+) -> Tuple[Callable[[PyCVariants], None], Callable[[], None]]:
+    """like make_statements_dispatcher, but consecutive asserted calls
+    on the same board are written to C as rows of a static table
+    {op, arg1, arg2, arg3, expected} checked by run_records from
+    templates/c_table_file_template; returns (store, finish) -
+    finish() has to be called after the last statement"""
+    separator = ""
+    table_board: Optional[str] = None
+    table_size = 0
+    tables = 0
+    records = 0
+
+    def finish() -> None:
+        nonlocal table_board, tables, separator
+        if table_board is None:
+            return
+        first_record = records - table_size
+        c_output.write(
+            "\n};\n"
+            f"run_records({table_board}, records{tables}, {table_size}, "
+            f"{first_record});\n}}"
+        )
+        table_board = None
+        tables += 1
+        separator = "\n"
+
+    def store(statements: PyCVariants) -> None:
+        nonlocal separator, table_board, table_size, records
+        py_output.write(separator + statements["py"])
+
+        record = cast(RecordedPyCVariants, statements).get("record")
+        if record is None or record[0] not in TABLE_OPS:
+            finish()
+            c_output.write(separator + statements["c"])
+        else:
+            if table_board != record[1]:
+                finish()
+                c_output.write(
+                    f"{separator}{{\nstatic const uint32_t records{tables}[] = {{"
+                )
+                table_board, table_size = record[1], 0
+            c_output.write("\n" + render_record(record))
+            table_size += 1
+            records += 1
+
+        separator = "\n"
+
+    return store, finish
+
+
 def make_comment(text: str) -> PyCVariants:
     return {"c": f"/*\n{text}\n*/", "py": f'"""\n{text}\n"""'}
 
@@ -189,6 +347,20 @@ def get_coords_around(gamma: Gamma, x: int, y: int, r: int = 1) -> List[Coords]:
     return list(coords - {(x, y)})
 
 
+def get_spiral_coords(width: int, height: int) -> Iterator[Coords]:
+    """all fields (x, y) along a clockwise spiral from (0, 0) to the centre,
+    ring after ring; consecutive fields are always neighbors"""
+    left, top, right, bottom = 0, 0, width - 1, height - 1
+    while left <= right and top <= bottom:
+        yield from ((x, top) for x in range(left, right + 1))
+        yield from ((right, y) for y in range(top + 1, bottom + 1))
+        if top < bottom:
+            yield from ((x, bottom) for x in range(right - 1, left - 1, -1))
+        if left < right:
+            yield from ((left, y) for y in range(bottom - 1, top, -1))
+        left, top, right, bottom = left + 1, top + 1, right - 1, bottom - 1
+
+
 def make_random_id() -> str:
     return str(random.randint(10 ** 8, 10 ** 9 - 1))
 
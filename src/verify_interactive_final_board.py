@@ -1,91 +1,412 @@
+from __future__ import annotations
+
+import argparse
+import collections
 import re
 import sys
 
+from typing import Deque, Dict, List, Optional, Tuple, Union
 
-def normalize_pyte(raw_result: str) -> str:
-    """ta metoda normalizacji używa emulatora terminala
-    do wyrenderowania finalnej planszy
-    wymaga zainstalowania paczki `pyte` z pip
+"""
+Sprawdzanie ostatniej planszy wypisanej przez gamme w trybie interaktywnym.
+Wyjscie jest przetwarzane strumieniowo kawalek po kawalku, w stalej pamieci
+- nawet gigabajty wyjscia (przerysowanie planszy 1000x1000 po kazdym
+klawiszu) nie sa trzymane w calosci.
 
-    pyte nie wspiera następujących ansi escape codes:
-    Esc[s -- save cursor position
-    Esc[u -- restore cursor position
-    i potencjalnie jakies inne
-    """
-    try:
-        import pyte
-    except ImportError:
-        print("`pyte` nie jest zainstalowane lub nie jest widoczne dla skryptu")
-        sys.exit(2)
+Domyslnie wyjscie jest renderowane na wbudowanym emulatorze ekranu (Screen,
+rozmiar dobrany do planszy: ruchy kursora, zapamietanie/przywrocenie pozycji,
+czyszczenie linii i ekranu), a plansza jest szukana na koncowym ekranie.
+Z --lines sekwencje ANSI sa tylko pomijane (BoardTracker) i brana jest
+ostatnia plansza wypisana linia po linii - szybciej, ale plansze rysowane
+przez przesuwanie kursora nie zostana rozpoznane.
 
-    screen = pyte.Screen(100, 30)
-    stream = pyte.Stream(screen)
-    stream.feed(raw_result)
-    return "\n".join(map(str.strip, screen.display))
-
-
-def normalize_naive(raw_result: str) -> str:
-    """ta metoda normalizacji używa bardzo naiwnej metody
-    usuwaia części ansi escape codes, bardzo duża szansa
-    na false-negative; warto ewentualnie uzupełnić o dodatkowe
-    potrzebne kody"""
-    return (
-        raw_result.encode("ASCII")
-        .replace(b"\33[0m", b"")
-        .replace(b"\33[?25h", b"")
-        .replace(b"\33[2j", b"")
-        .replace(b"\33[H", b"")
-        .replace(b"\33[30;47m", b"")
-        .replace(b"\33[K", b"")
-        .replace(b"\33[7m", b"")
-        .decode("ASCII")
-    )
+Usage: python verify_interactive_final_board.py gamma_output.file expected.vmr
+       [--lines]
+"""
+
+# pola planszy; gracze od 10 wypisywani sa jako [p]
+BOARD_CHARS = b".0123456789[]"
+CHUNK_SIZE = 1 << 20
+# dluzsze niedokonczone sekwencje na koncu kawalka sa traktowane jak tekst
+MAX_ESCAPE_LENGTH = 64
+# CSI, OSC albo dwuznakowa sekwencja ESC x
+ESCAPE = re.compile(
+    rb"\x1b(?:\[[\x30-\x3f]*[\x20-\x2f]*[\x40-\x7e]"
+    rb"|\][^\x07\x1b]*(?:\x07|\x1b\\)"
+    rb"|[\x20-\x2f]*[\x30-\x5a\x5c\x5e-\x7e])"
+)
+# kursor na pozycje (zwykle poczatek ekranu) albo czyszczenie ekranu
+NEW_FRAME = re.compile(rb"\x1b\[[\x30-\x3f]*[\x20-\x2f]*[HfJ]")
+# tekst | CSI (parametry, znak koncowy) | OSC | ESC x | inny znak sterujacy
+SCREEN_TOKEN = re.compile(
+    rb"([^\x00-\x1f\x7f]+)"
+    rb"|\x1b(?:\[([\x30-\x3f]*)[\x20-\x2f]*([\x40-\x7e])"
+    rb"|\][^\x07\x1b]*(?:\x07|\x1b\\)"
+    rb"|[\x20-\x2f]*([\x30-\x5a\x5c\x5e-\x7e]))"
+    rb"|([\x00-\x1f\x7f])"
+)
+# ekran jest co najmniej taki jak w typowym terminalu, a poza plansza
+# zostaje miejsce na komunikaty
+MIN_SCREEN = (100, 30)
+SCREEN_MARGIN = (40, 10)
+# sekwencje prywatne CSI ? n h/l przelaczajace na ekran alternatywny
+ALTERNATE_SCREEN = {b"?47", b"?1047", b"?1049"}
+
+
+class BoardTracker:
+    """Streaming parser of the interactive output: escape sequences are
+    skipped, maximal runs of lines made only of board characters are boards
+    (the first line of a run may be the end of a longer line) and cursor home
+    or screen clearing starts a new run.
+
+    final_board is the last finished run of more than one line. With the
+    expected board only its last rows are kept (memory does not depend on
+    the output length) and the run is matched against the board row by row,
+    like `expected in run`; final_board is then the matching part of the run
+    or, without a match, its last rows."""
+
+    final_board: Optional[str]
+
+    def __init__(self, expected: Optional[str] = None) -> None:
+        self.final_board = None
+        self._rows = [] if expected is None else expected.encode().split(b"\n")
+        # the board ends with \n - the last row has to be a whole line
+        self._last_row_whole = len(self._rows) > 1 and not self._rows[-1]
+        if self._last_row_whole:
+            self._rows.pop()
+        self._run: Deque[bytes] = collections.deque(maxlen=len(self._rows) or None)
+        self._run_length = 0
+        # numbers of rows of the board matched by the current lines
+        self._partial_matches: List[int] = []
+        self._match: Optional[bytes] = None
+        # board characters at the end of the current line
+        self._line = bytearray()
+        # the current line consists only of board characters so far
+        self._clean = True
+        # unfinished escape sequence from the end of the previous chunk
+        self._pending = b""
+
+    def _end_run(self) -> None:
+        if self._run_length > 1:
+            board = self._match or b"".join(self._run)
+            self.final_board = board.decode("ASCII")
+        self._run.clear()
+        self._run_length = 0
+        self._partial_matches = []
+        self._match = None
+
+    def _row_matches(self, row: int, line: bytes) -> bool:
+        expected = self._rows[row]
+        first, last = row == 0, row == len(self._rows) - 1
+        if first and last:
+            return line.endswith(expected) if self._last_row_whole else (
+                expected in line
+            )
+        if first:
+            return line.endswith(expected)
+        if last and not self._last_row_whole:
+            return line.startswith(expected)
+        return line == expected
+
+    def _match_line(self, line: bytes) -> None:
+        """the run matched as a whole would contain the board iff some
+        consecutive lines match all its rows"""
+        # rows with the same contents are compared with the line only once
+        results: Dict[Tuple[bool, bool, bytes], bool] = {}
+        last = len(self._rows) - 1
+        matched = []
+        for row in [*self._partial_matches, 0]:
+            key = (row == 0, row == last, self._rows[row])
+            if key not in results:
+                results[key] = self._row_matches(row, line)
+            if results[key]:
+                matched.append(row + 1)
+        if len(self._rows) in matched:
+            self._match = b"".join(self._run)
+        self._partial_matches = [row for row in matched if row < len(self._rows)]
+
+    def _add_text(self, text: bytes) -> None:
+        dirty_part = text.rstrip(BOARD_CHARS)
+        if dirty_part:
+            self._clean = False
+            self._line = bytearray(text[len(dirty_part) :])
+        else:
+            self._line += text
+
+    def _end_line(self) -> None:
+        if not (self._clean and self._line):
+            self._end_run()
+        if self._line:
+            self._run.append(bytes(self._line) + b"\n")
+            self._run_length += 1
+            if self._rows and self._match is None:
+                self._match_line(bytes(self._line))
+        self._line = bytearray()
+        self._clean = True
+
+    def _new_frame(self) -> None:
+        self._end_run()
+        self._line = bytearray()
+        self._clean = True
+
+    def feed(self, chunk: bytes, final: bool = False) -> None:
+        data = self._pending + chunk.replace(b"\r", b"")
+        self._pending = b""
+        last_escape = data.rfind(b"\33", max(0, len(data) - MAX_ESCAPE_LENGTH))
+        if not final and last_escape != -1 and not ESCAPE.match(data, last_escape):
+            data, self._pending = data[:last_escape], data[last_escape:]
+
+        for number, frame in enumerate(NEW_FRAME.split(data)):
+            if number:
+                self._new_frame()
+            *lines, rest = ESCAPE.sub(b"", frame).split(b"\n")
+            for line in lines:
+                self._add_text(line)
+                self._end_line()
+            self._add_text(rest)
+
+    def finish(self) -> Optional[str]:
+        """the last line has to end with \\n to be a part of a board"""
+        self.feed(b"", final=True)
+        self._new_frame()
+        return self.final_board
+
+
+class Screen:
+    """Minimal terminal screen: printable bytes overwrite the screen at the
+    cursor (without wrapping - text beyond the last column is lost), \\n
+    is CR LF as after ONLCR, the bottom line feed scrolls. Handled escape
+    sequences: CSI A/B/C/D/E/F/G/d/H/f (cursor), J/K (erasing), s/u and
+    ESC 7/8 (save/restore cursor), ESC D/E/M/c and the alternate screen;
+    others (e.g. colours) are ignored. Text runs are written as slices."""
+
+    def __init__(self, columns: int, rows: int) -> None:
+        self.columns = columns
+        self.rows = rows
+        self.x = self.y = 0
+        self._lines = [self._blank() for _ in range(rows)]
+        self._saved_cursor = (0, 0)
+        self._main_screen: Optional[Tuple[List[bytearray], int, int]] = None
+        self._pending = b""
+
+    @classmethod
+    def for_board(cls, board: str) -> Screen:
+        lines = board.splitlines()
+        width = max(map(len, lines), default=0)
+        return cls(
+            max(MIN_SCREEN[0], width + SCREEN_MARGIN[0]),
+            max(MIN_SCREEN[1], len(lines) + SCREEN_MARGIN[1]),
+        )
+
+    def _blank(self) -> bytearray:
+        return bytearray(b" " * self.columns)
 
+    def _move(self, x: int, y: int) -> None:
+        self.x = min(max(x, 0), self.columns - 1)
+        self.y = min(max(y, 0), self.rows - 1)
 
-def verify_board(raw_result: str, expected_board: str) -> bool:
+    def _line_feed(self) -> None:
+        if self.y < self.rows - 1:
+            self.y += 1
+        else:
+            del self._lines[0]
+            self._lines.append(self._blank())
+
+    def _reverse_line_feed(self) -> None:
+        if self.y > 0:
+            self.y -= 1
+        else:
+            del self._lines[-1]
+            self._lines.insert(0, self._blank())
+
+    def _write(self, text: bytes) -> None:
+        end = min(self.x + len(text), self.columns)
+        self._lines[self.y][self.x : end] = text[: end - self.x]
+        # x == columns: za ostatnia kolumna, kolejny tekst jest ucinany
+        self.x = end
+
+    def _erase(self, line: int, start: int, end: int) -> None:
+        self._lines[line][start:end] = b" " * (end - start)
+
+    def _erase_display(self, mode: int) -> None:
+        if mode == 0:
+            self._erase(self.y, self.x, self.columns)
+            lines = range(self.y + 1, self.rows)
+        elif mode == 1:
+            self._erase(self.y, 0, min(self.x + 1, self.columns))
+            lines = range(self.y)
+        else:
+            lines = range(self.rows)
+        for line in lines:
+            self._lines[line] = self._blank()
+
+    def _erase_line(self, mode: int) -> None:
+        if mode == 0:
+            self._erase(self.y, self.x, self.columns)
+        elif mode == 1:
+            self._erase(self.y, 0, min(self.x + 1, self.columns))
+        else:
+            self._erase(self.y, 0, self.columns)
+
+    def _alternate_screen(self, enable: bool) -> None:
+        if enable and self._main_screen is None:
+            self._main_screen = (self._lines, self.x, self.y)
+            self._lines = [self._blank() for _ in range(self.rows)]
+        elif not enable and self._main_screen is not None:
+            self._lines, self.x, self.y = self._main_screen
+            self._main_screen = None
+
+    def _csi(self, parameters: bytes, final: bytes) -> None:
+        if parameters.startswith(b"?"):
+            if parameters in ALTERNATE_SCREEN and final in b"hl":
+                self._alternate_screen(final == b"h")
+            return
+
+        numbers = [int(p) if p.isdigit() else 0 for p in parameters.split(b";")]
+        first = numbers[0]
+        n = max(first, 1)
+        x, y = min(self.x, self.columns - 1), self.y
+        if final == b"A":
+            self._move(x, y - n)
+        elif final == b"B":
+            self._move(x, y + n)
+        elif final == b"C":
+            self._move(x + n, y)
+        elif final == b"D":
+            self._move(x - n, y)
+        elif final == b"E":
+            self._move(0, y + n)
+        elif final == b"F":
+            self._move(0, y - n)
+        elif final == b"G":
+            self._move(n - 1, y)
+        elif final == b"d":
+            self._move(x, n - 1)
+        elif final in b"Hf":
+            column = numbers[1] if len(numbers) > 1 else 0
+            self._move(max(column, 1) - 1, n - 1)
+        elif final == b"J":
+            self._erase_display(first)
+        elif final == b"K":
+            self._erase_line(first)
+        elif final == b"s":
+            self._saved_cursor = (self.x, self.y)
+        elif final == b"u":
+            self._move(*self._saved_cursor)
+
+    def _escape(self, final: bytes) -> None:
+        if final == b"7":
+            self._saved_cursor = (self.x, self.y)
+        elif final == b"8":
+            self._move(*self._saved_cursor)
+        elif final == b"D":
+            self._line_feed()
+        elif final == b"E":
+            self.x = 0
+            self._line_feed()
+        elif final == b"M":
+            self._reverse_line_feed()
+        elif final == b"c":
+            self._erase_display(2)
+            self._move(0, 0)
+
+    def _control(self, code: bytes) -> None:
+        if code == b"\n":
+            self.x = 0
+            self._line_feed()
+        elif code == b"\r":
+            self.x = 0
+        elif code == b"\b":
+            self._move(self.x - 1, self.y)
+        elif code == b"\t":
+            self._move((self.x // 8 + 1) * 8, self.y)
+
+    def feed(self, chunk: bytes, final: bool = False) -> None:
+        data = self._pending + chunk
+        self._pending = b""
+        last_escape = data.rfind(b"\33", max(0, len(data) - MAX_ESCAPE_LENGTH))
+        if not final and last_escape != -1 and not ESCAPE.match(data, last_escape):
+            data, self._pending = data[:last_escape], data[last_escape:]
+
+        for text, parameters, csi, escape, control in SCREEN_TOKEN.findall(data):
+            if text:
+                self._write(text)
+            elif csi:
+                self._csi(parameters, csi)
+            elif escape:
+                self._escape(escape)
+            elif control:
+                self._control(control)
+
+    def display(self) -> List[str]:
+        return [line.decode("ASCII", "replace").strip() for line in self._lines]
+
+    def finish(self) -> Optional[str]:
+        """the last board on the final screen"""
+        self.feed(b"", final=True)
+        tracker = BoardTracker()
+        tracker.feed("".join(line + "\n" for line in self.display()).encode())
+        return tracker.finish()
+
+
+Verifier = Union[BoardTracker, Screen]
+
+
+def make_verifier(expected_board: str, render_screen: bool = True) -> Verifier:
+    """something to feed() the output to and finish() with the final board"""
+    if render_screen:
+        return Screen.for_board(expected_board)
+    return BoardTracker(expected_board)
+
+
+def verify_board(
+    raw_result: str, expected_board: str, render_screen: bool = True
+) -> bool:
     """raw result to output gamma, expected board to oczekiwana
     plansza na koniec dzialania programu; jezeli uzywasz jakiejs
     biblioteki do obslugi terminala albo rysujesz ramki itp
     to musisz zmodyfikowac te metoda tak, zeby sobie z tym poradzila
     Zwraca True jezeli wynik jest prawidlowy, wpp False
 
-    przeprowadza normalizacje danych z gammy albo w sposob naiwny
-    przez zastepowanie kodow, albo semi-inteligentnie renderujac
-    caly output do finalnej postaci uzywajac emulatora terminala
-    pyte -- domyslnie uzywana jest opcja naiwna
+    wyjscie gammy jest renderowane na emulatorze ekranu (Screen) albo,
+    z render_screen=False, sekwencje ANSI sa tylko pomijane (BoardTracker)
 
     sprawdzarka NIE ZADZIAŁA dla plansz o liczbie wierszy mniejszej niż 2
     """
+    verifier = make_verifier(expected_board, render_screen)
+    verifier.feed(raw_result.encode())
+    return check_final_board(verifier, expected_board)
 
-    use_pyte = False
-
-    if use_pyte:
-        normalized_data = normalize_pyte(raw_result)
-    else:
-        normalized_data = normalize_naive(raw_result)
 
-    matched = re.findall(r"(([\.\d]+\n)+)", normalized_data)
-    try:
-        final_board = [f for (f, s) in matched if f.count("\n") > 1][-1]
-    except IndexError:
+def check_final_board(verifier: Verifier, expected_board: str) -> bool:
+    final_board = verifier.finish()
+    if final_board is None:
         print("Nie znaleziono zadnej planszy; niepoprawna normalizacja danych")
         sys.exit(2)
-    else:
-        return expected_board in final_board
+    return expected_board in final_board
 
 
-def main(result_path: str, expected_path: str) -> int:
-    with open(result_path) as f:
-        result = f.read()
+def main(result_path: str, expected_path: str, render_screen: bool = True) -> int:
     with open(expected_path) as f:
         expected_board = f.read()
 
-    return int(not verify_board(result, expected_board))
+    verifier = make_verifier(expected_board, render_screen)
+    with open(result_path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            verifier.feed(chunk)
+
+    return int(not check_final_board(verifier, expected_board))
 
 
 if __name__ == "__main__":
-    args = sys.argv[1:]
-    if len(args) != 2:
-        exit("Usage: python script.py gamma_output.file expected_output.file")
+    parser = argparse.ArgumentParser(
+        description="check the final board in the output of interactive gamma"
+    )
+    parser.add_argument("gamma_output")
+    parser.add_argument("expected_output")
+    parser.add_argument(
+        "--lines", action="store_true", help="skip escapes instead of rendering"
+    )
+    args = parser.parse_args()
 
-    sys.exit(main(args[0], args[1]))
+    sys.exit(main(args.gamma_output, args.expected_output, not args.lines))
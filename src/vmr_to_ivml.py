@@ -1,45 +1,198 @@
+import argparse
+import itertools
 import re
 import sys
 
-from typing import List
+from typing import Iterable, Iterator, List, NamedTuple, Sequence, Tuple
 
+from part2_ivm import Compiler
 
-def get_board() -> List[str]:
-    height = 0
-    width = 0
-    board = []
-    for line in sys.stdin.readlines():
+"""
+Zamienia plansze (.vmr, np. wynik gamma_board) na skrypt interactive mode
+(.ivml), ktory ja odtwarza. Gracz p moze byc zapisany jako cyfra albo [p].
+
+Gra ma tylu graczy, ile wynosi najwiekszy numer na planszy, i nieograniczona
+liczbe obszarow, wiec dopoki sa wolne pola wszyscy moga sie ruszac i kolejny
+SKIPTURN zawsze przechodzi do nastepnego gracza. Skrypt sledzi aktualnego
+gracza i kolejnosc pol wybiera tak, zeby nacisnac jak najmniej klawiszy
+(strzalki + c + spacja): pola sa brane wezykiem wiersz po wierszu, a z okna
+kolejnych --window pol zachlannie wybierane jest najtansze (blisko kursora
+i gracz, ktory zaraz ma ruch). Wybierany jest tanszy z planow: zachlanny
+albo czysty wezyk.
+
+Na stderr wypisywana jest statystyka: liczba klawiszy i instrukcji oraz
+ile klawiszy i czasu oczekiwania (WAIT po kazdej instrukcji) oszczedza plan
+wzgledem dawnego odtwarzania po wierszach z 9 graczami.
+
+Usage: python vmr_to_ivml.py < plansza.vmr > test.ivml [--window N]
+"""
+
+ROW = re.compile(r"(?:\[\d+\]|[1-9]|\.)+")
+FIELD = re.compile(r"\[(\d+)\]|([1-9])|\.")
+FREE_FIELD = 0
+# tyle graczy mialy skrypty generowane wczesniej
+LEGACY_PLAYERS = 9
+DEFAULT_WINDOW = 16
+
+
+class Cell(NamedTuple):
+    x: int
+    y: int
+    player: int
+
+
+class Plan(NamedTuple):
+    cells: List[Cell]
+    keystrokes: int
+    statements: int
+
+
+def parse_row(line: str) -> List[int]:
+    if not ROW.fullmatch(line):
+        raise ValueError(f"Incorrect line: {line}")
+    return [
+        int(multi_digit or digit or FREE_FIELD)
+        for multi_digit, digit in FIELD.findall(line)
+    ]
+
+
+def get_board(lines: Iterable[str]) -> List[List[int]]:
+    """rows from the top, as printed; reading stops at an empty line"""
+    board: List[List[int]] = []
+    for line in lines:
         line = line.strip()
         if not line:
             break
-        height += 1
-        if not width:
-            width = len(line)
-        if width != len(line):
-            raise Exception("Lines have different width")
-        if not re.match(r"([1-9]|\.)+", line):
-            print(line)
-            raise Exception("Incorrect line")
-        board.append(line)
-    if height < 2 or width < 1:
-        raise Exception("Dimensions are to small")
+        row = parse_row(line)
+        if board and len(row) != len(board[0]):
+            raise ValueError("Lines have different width")
+        board.append(row)
+    if len(board) < 2 or len(board[0]) < 1:
+        raise ValueError("Dimensions are to small")
     return board
 
 
-def main():
-    board = get_board()
-    width = len(board[0])
+def serpentine(board: Sequence[Sequence[int]]) -> Iterator[Cell]:
+    """occupied fields from (0, 0) - the bottom row left to right,
+    the next one right to left and so on"""
+    height = len(board)
+    for y in range(height):
+        row = board[height - 1 - y]
+        columns = range(len(row)) if y % 2 == 0 else reversed(range(len(row)))
+        for x in columns:
+            if row[x] != FREE_FIELD:
+                yield Cell(x, y, row[x])
+
+
+def row_order(board: Sequence[Sequence[int]]) -> Iterator[Cell]:
+    """order of the old script: from the top row, left to right"""
     height = len(board)
-    print(f"START {width} {height} 9 {width * height}")
-    for y, row in enumerate(board, start=1):
-        for x, cell in enumerate(row):
-            if cell == ".":
-                continue
-            print(f"GOTO {x} {height - y}")
-            player = int(cell)
-            print(f"SKIPTURNS {player - 1}")
-            print(f"MOVE")
-            print(f"SKIPTURNS {9 - player}")
+    for top_y, row in enumerate(board, start=1):
+        for x, player in enumerate(row):
+            if player != FREE_FIELD:
+                yield Cell(x, height - top_y, player)
+
+
+def count_players(board: Sequence[Sequence[int]]) -> int:
+    return max(1, *map(max, board))
+
+
+def skips(current: int, player: int, players: int) -> int:
+    return (player - current) % players
+
+
+def plan(cells: Iterable[Cell], players: int, window: int) -> Plan:
+    """from the next `window` fields (in the given order) always takes
+    the one needing the fewest keystrokes; window 1 keeps the order"""
+    x, y, current = 0, 0, 1
+    ordered: List[Cell] = []
+    keystrokes = statements = 0
+    candidates: List[Cell] = []
+    remaining = iter(cells)
+
+    def cost(c: Cell) -> int:
+        return abs(c.x - x) + abs(c.y - y) + skips(current, c.player, players)
+
+    while True:
+        candidates.extend(itertools.islice(remaining, window - len(candidates)))
+        if not candidates:
+            break
+
+        cell = min(candidates, key=cost)
+        candidates.remove(cell)
+        ordered.append(cell)
+
+        keystrokes += cost(cell) + 1  # + MOVE
+        statements += 1 + ((cell.x, cell.y) != (x, y))
+        statements += skips(current, cell.player, players) > 0
+        x, y, current = cell.x, cell.y, cell.player % players + 1
+
+    return Plan(ordered, keystrokes, statements)
+
+
+def legacy_cost(board: Sequence[Sequence[int]]) -> Tuple[int, int]:
+    """(keystrokes, statements) of the old script: for every field
+    GOTO, SKIPTURNS p-1, MOVE, SKIPTURNS players-p"""
+    players = max(LEGACY_PLAYERS, count_players(board))
+    x, y = 0, 0
+    keystrokes = statements = 0
+    for cell in row_order(board):
+        keystrokes += abs(cell.x - x) + abs(cell.y - y) + players
+        statements += 4
+        x, y = cell.x, cell.y
+    return keystrokes, statements
+
+
+def to_statements(board: Sequence[Sequence[int]], cells_plan: Plan) -> Iterator[str]:
+    players = count_players(board)
+    yield f"START {len(board[0])} {len(board)} {players} {len(board[0]) * len(board)}"
+    yield "GOTO 0 0"
+
+    x, y, current = 0, 0, 1
+    for cell in cells_plan.cells:
+        if (cell.x, cell.y) != (x, y):
+            yield f"GOTO {cell.x} {cell.y}"
+        to_skip = skips(current, cell.player, players)
+        if to_skip:
+            yield f"SKIPTURNS {to_skip}"
+        yield "MOVE"
+        x, y, current = cell.x, cell.y, cell.player % players + 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="make an interactive mode script recreating a board"
+    )
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=DEFAULT_WINDOW,
+        help="how many next fields the greedy planner chooses from",
+    )
+    args = parser.parse_args()
+
+    try:
+        board = get_board(sys.stdin)
+    except ValueError as e:
+        exit(str(e))
+
+    players = count_players(board)
+    plans = [
+        plan(serpentine(board), players, max(args.window, 1)),
+        plan(serpentine(board), players, 1),
+    ]
+    best = min(plans, key=lambda p: (p.keystrokes, p.statements))
+    sys.stdout.writelines(s + "\n" for s in to_statements(board, best))
+
+    legacy_keystrokes, legacy_statements = legacy_cost(board)
+    wait = Compiler.default_wait_time
+    print(
+        f"{len(best.cells)} fields: {best.keystrokes} keystrokes, "
+        f"{best.statements} statements; saved {legacy_keystrokes - best.keystrokes}"
+        f" keystrokes and ~{(legacy_statements - best.statements) * wait:.2f} s"
+        f" of waiting (SETWAIT {wait}) against the row by row script",
+        file=sys.stderr,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,30 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from verify_interactive_final_board import BoardTracker, verify_board  # noqa: E402
+
+BOARD = "..1\n.2.\n1..\n"
+
+
+def test_board_followed_by_board_character_line() -> None:
+    assert verify_board(BOARD + "3\n", BOARD, render_screen=False)
+
+
+def test_board_between_board_character_lines() -> None:
+    output = "1\n" + BOARD + "3\n22\n"
+    assert verify_board(output, BOARD, render_screen=False)
+
+
+def test_board_split_between_chunks() -> None:
+    tracker = BoardTracker(BOARD)
+    for byte in (BOARD + "\x1b[7m3\x1b[0m\n").encode():
+        tracker.feed(bytes([byte]))
+    final_board = tracker.finish()
+    assert final_board is not None and BOARD in final_board
+
+
+def test_last_board_is_checked() -> None:
+    output = BOARD + "PLAYER 1\n" + BOARD.replace("2", "1")
+    assert not verify_board(output, BOARD, render_screen=False)